@@ -1,7 +1,9 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 import uvicorn
 import os
+import sys
 import time
 from datetime import datetime
 
@@ -12,7 +14,12 @@ from utils.logger import logger, log_api_request
 app = FastAPI(title="Mining Design System API", version="2.1")
 
 # 配置 CORS - 从环境变量读取允许的域名，默认为本地开发地址
-ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173").split(",")
+# 启动时一次性去除空白并统一小写，避免每次请求重复处理
+ALLOWED_ORIGINS = tuple(
+    o.strip().lower()
+    for o in os.getenv("ALLOWED_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173").split(",")
+    if o.strip()
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,29 +27,64 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,  # 预检请求缓存24小时，减少上传等跨域请求的 OPTIONS 往返
 )
 
+# 压缩较大的响应（钻孔列表、合并结果等 JSON 数据重复度高，压缩比可观）
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+
+# 不记录日志的高频路径
+SKIP_LOG_PATHS = frozenset({"/health", "/", "/favicon.ico"})
+
+
+class RequestLoggingMiddleware:
+    """请求日志中间件（纯 ASGI 实现，避免 BaseHTTPMiddleware 的额外开销）"""
+
+    def __init__(self, app):
+        self.app = app
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """请求日志中间件"""
-    start_time = time.time()
-    response = await call_next(request)
-    duration_ms = (time.time() - start_time) * 1000
+    async def __call__(self, scope, receive, send):
+        # 非 HTTP 请求及健康检查等高频路径直接放行，不包装 send、不计时
+        if scope["type"] != "http" or scope["path"] in SKIP_LOG_PATHS:
+            await self.app(scope, receive, send)
+            return
 
-    # 记录请求日志（跳过健康检查等高频请求）
-    if request.url.path not in ["/health", "/", "/favicon.ico"]:
-        log_api_request(request.method, request.url.path, response.status_code, duration_ms)
+        start = time.perf_counter()
+        status_code = None
+        duration_ms = None
 
-    return response
+        async def send_wrapper(message):
+            nonlocal status_code, duration_ms
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                duration_ms = (time.perf_counter() - start) * 1000
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # 记录请求日志；应用抛出异常且未发送响应头时，按 500 记录
+            if status_code is None:
+                status_code = 500
+                duration_ms = (time.perf_counter() - start) * 1000
+            log_api_request(scope["method"], scope["path"], status_code, duration_ms)
+
+
+app.add_middleware(RequestLoggingMiddleware)
+
+# 注册路由：(模块, 路径前缀, 标签)
+ROUTERS = (
+    (upload, "/api/upload", "Upload"),
+    (boreholes, "/api/boreholes", "Boreholes"),
+    (design, "/api/design", "Design"),
+    (score, "/api/score", "Score"),
+    (boundary, "/api/boundary", "Boundary"),
+    (geology, "/api/geology", "Geology"),
+)
 
-# 注册路由
-app.include_router(upload.router, prefix="/api/upload", tags=["Upload"])
-app.include_router(boreholes.router, prefix="/api/boreholes", tags=["Boreholes"])
-app.include_router(design.router, prefix="/api/design", tags=["Design"])
-app.include_router(score.router, prefix="/api/score", tags=["Score"])
-app.include_router(boundary.router, prefix="/api/boundary", tags=["Boundary"])
-app.include_router(geology.router, prefix="/api/geology", tags=["Geology"])
+for module, prefix, tag in ROUTERS:
+    app.include_router(module.router, prefix=prefix, tags=[tag])
 
 
 @app.get("/")
@@ -79,4 +121,13 @@ if __name__ == "__main__":
     logger.info("Mining Design System Backend 启动中...")
     logger.info(f"允许的CORS域名: {ALLOWED_ORIGINS}")
     logger.info("="*50)
-    uvicorn.run("main:app", host="0.0.0.0", port=3001, reload=True)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=3001,
+        reload=True,
+        # uvloop 不支持 Windows，该平台回退到 asyncio 事件循环
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        access_log=False,  # 请求日志已由 RequestLoggingMiddleware 记录
+    )
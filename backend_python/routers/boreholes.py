@@ -1,42 +1,88 @@
 from fastapi import APIRouter, HTTPException, Body, UploadFile, File, Form
+from utils.responses import json_response
+from starlette.concurrency import run_in_threadpool
 from store import store
-from utils.parsing import parse_csv_file
+from utils.parsing import parse_csv_dataframe, dataframe_to_records
 import pandas as pd
 import numpy as np
+import asyncio
 from typing import List, Dict, Optional
+from functools import lru_cache
 
 router = APIRouter()
 
 @router.get("/")
 async def get_boreholes():
     # 返回归一化后的钻孔坐标（与设计模块保持一致）
-    return {"boreholes": store.get_normalized_boreholes()}
+    return json_response({"boreholes": store.get_normalized_boreholes()})
 
 
 @router.get("/coal-seams")
 async def get_coal_seams():
     """获取所有识别到的煤层列表"""
-    coal_seams = []
+    coal_seams = list(_compute_coal_seams(store.field_version('borehole_layer_data')))
+    return {"coal_seams": coal_seams, "count": len(coal_seams)}
 
-    # 从分层数据中提取煤层
-    if store.borehole_layer_data:
-        df = pd.DataFrame(store.borehole_layer_data)
 
-        # 查找煤层相关列
-        seam_col = next((c for c in df.columns if '煤层' in c or 'seam' in c.lower()), None)
-        name_col = next((c for c in df.columns if '名称' in c or 'name' in c.lower()), None)
+@lru_cache(maxsize=32)
+def _resolve_layer_columns(columns: tuple) -> Dict[str, Optional[str]]:
+    """
+    按关键字识别分层数据中的 煤层/厚度/名称/编号 列
 
-        if seam_col:
-            coal_seams = df[seam_col].dropna().unique().tolist()
-        elif name_col:
-            # 从名称列中识别煤层
-            names = df[name_col].dropna().unique().tolist()
-            coal_seams = [n for n in names if '煤' in str(n)]
+    列名只在上传时变化，按列名元组缓存识别结果，列名只做一次小写转换
+    """
+    lowered = [(c, str(c).lower()) for c in columns]
 
-    # 去重并排序
-    coal_seams = sorted(list(set(coal_seams)))
+    def find(keywords, lower_keywords):
+        return next((c for c, lc in lowered
+                     if any(k in str(c) for k in keywords) or any(k in lc for k in lower_keywords)), None)
 
-    return {"coal_seams": coal_seams, "count": len(coal_seams)}
+    return {
+        'seam': find(('煤层',), ('seam',)),
+        'thick': find(('厚',), ('thick',)),
+        'name': find(('名称',), ('name',)),
+        'id': find(('编号', '孔号'), ('id',)),
+    }
+
+
+@lru_cache(maxsize=4)
+def _compute_coal_seams(version: int) -> tuple:
+    """
+    从分层数据中提取煤层（去重并排序）
+
+    分层数据只在上传时变化，结果按数据版本号缓存；
+    直接遍历记录列表，不构建 DataFrame
+    """
+    layer_data = store.borehole_layer_data
+    if not layer_data:
+        return ()
+
+    # 所有记录的列名（保持首次出现顺序）
+    columns = dict.fromkeys(k for row in layer_data for k in row)
+
+    # 查找煤层相关列
+    resolved = _resolve_layer_columns(tuple(columns))
+    seam_col = resolved['seam']
+    name_col = resolved['name']
+
+    coal_seams = set()
+    if seam_col:
+        for row in layer_data:
+            value = row.get(seam_col)
+            if value is not None and value == value:  # 跳过 None/NaN
+                coal_seams.add(value)
+    elif name_col:
+        # 从名称列中识别煤层
+        for row in layer_data:
+            value = row.get(name_col)
+            if value is not None and value == value and '煤' in str(value):
+                coal_seams.add(value)
+
+    try:
+        return tuple(sorted(coal_seams))
+    except TypeError:
+        # 数值与文本混合的列无法直接比较，按字符串排序
+        return tuple(sorted(coal_seams, key=str))
 
 @router.post("/")
 async def upload_boreholes_json(boreholes: Dict = Body(...)):
@@ -45,8 +91,7 @@ async def upload_boreholes_json(boreholes: Dict = Body(...)):
     if not data:
         return {"success": True, "count": 0}
         
-    store.boreholes = data
-    _update_boundary_if_needed(data)
+    await run_in_threadpool(_save_boreholes, data)
     return {"success": True, "count": len(data)}
 
 @router.post("/batch-upload")
@@ -56,21 +101,29 @@ async def batch_upload_boreholes(
 ):
     results = {"success": [], "errors": [], "summary": {}}
     all_data = []
-    
-    for file in files:
-        try:
-            content = await file.read()
-            data = parse_csv_file(content)
-            if data:
-                # Add filename to each record for tracking
-                for row in data:
-                    row['_source_file'] = file.filename
-                all_data.extend(data)
-                results["success"].append(file.filename)
-            else:
-                results["errors"].append(f"{file.filename}: Empty file")
-        except Exception as e:
-            results["errors"].append(f"{file.filename}: {str(e)}")
+
+    def _parse(content: bytes, filename: str) -> List[Dict]:
+        df = parse_csv_dataframe(content)
+        if df.empty:
+            return []
+        # Add filename to each record for tracking（整列赋值，无需逐行写入）
+        return dataframe_to_records(df.assign(_source_file=filename))
+
+    async def _handle(file: UploadFile):
+        content = await file.read()
+        # 解析为 CPU 密集操作，放到线程池执行，与其他文件的读取重叠
+        return await run_in_threadpool(_parse, content, file.filename)
+
+    parsed = await asyncio.gather(*[_handle(f) for f in files], return_exceptions=True)
+
+    for file, data in zip(files, parsed):
+        if isinstance(data, Exception):
+            results["errors"].append(f"{file.filename}: {str(data)}")
+        elif data:
+            all_data.extend(data)
+            results["success"].append(file.filename)
+        else:
+            results["errors"].append(f"{file.filename}: Empty file")
             
     # Store raw layer data
     store.borehole_layer_data = all_data
@@ -79,38 +132,49 @@ async def batch_upload_boreholes(
     if all_data:
         df = pd.DataFrame(all_data)
         # Try to identify coal seam column
-        seam_col = next((c for c in df.columns if '煤层' in c or 'seam' in c.lower()), None)
+        resolved = _resolve_layer_columns(tuple(df.columns))
+        seam_col = resolved['seam']
         if seam_col:
-            stats = df.groupby(seam_col).size().to_dict()
             # Calculate average thickness if possible
-            thick_col = next((c for c in df.columns if '厚' in c or 'thick' in c.lower()), None)
-            summary_stats = {}
-            for seam, count in stats.items():
-                avg_thick = 0
-                if thick_col:
-                    try:
-                        avg_thick = df[df[seam_col] == seam][thick_col].mean()
-                    except:
-                        pass
-                summary_stats[seam] = {"钻孔数": count, "平均厚度": round(avg_thick, 2)}
+            thick_col = resolved['thick']
+            grouped = df.groupby(seam_col)
+            # 一次分组同时得到钻孔数与平均厚度，避免按煤层逐个过滤
+            agg = None
+            if thick_col:
+                try:
+                    agg = grouped[thick_col].agg(['size', 'mean'])
+                except Exception:
+                    agg = None
+            if agg is None:
+                agg = grouped.size().to_frame('size')
+                agg['mean'] = 0
+            summary_stats = {
+                seam: {"钻孔数": int(row['size']), "平均厚度": round(row['mean'], 2)}
+                for seam, row in agg.to_dict(orient='index').items()
+            }
             results["summary"] = {"煤层统计": summary_stats}
             
     return {"results": results}
 
 @router.post("/merge-with-coordinates")
 async def merge_data():
-    if not store.borehole_coordinates:
+    coords = store.borehole_coordinates
+    if not coords:
         raise HTTPException(status_code=400, detail="请先上传坐标文件")
-        
-    coords_df = pd.DataFrame(store.borehole_coordinates)
-    
-    # If we have layer data, try to merge
-    if store.borehole_layer_data:
-        layer_df = pd.DataFrame(store.borehole_layer_data)
+
+    layer_data = store.borehole_layer_data
+    if not layer_data:
+        # No layer data, fallback to random（直接使用原始列表，无需构建 DataFrame）
+        merged = _generate_mock_data(coords)
+        unmatched = []
+    else:
+        # If we have layer data, try to merge
+        coords_df = pd.DataFrame(coords)
+        layer_df = pd.DataFrame(layer_data)
         
         # Normalize ID columns
         # Find ID column in layer data
-        l_id_col = next((c for c in layer_df.columns if 'id' in c.lower() or '编号' in c or '孔号' in c), None)
+        l_id_col = _resolve_layer_columns(tuple(layer_df.columns))['id']
         
         # If no explicit ID column, try to use filename (remove extension)
         if not l_id_col and '_source_file' in layer_df.columns:
@@ -119,12 +183,12 @@ async def merge_data():
         
         if l_id_col:
             # Identify numeric columns for aggregation
-            numeric_cols = layer_df.select_dtypes(include=[np.number]).columns.tolist()
-            if l_id_col in numeric_cols: numeric_cols.remove(l_id_col)
+            numeric_cols = [c for c in layer_df.select_dtypes(include=[np.number]).columns if c != l_id_col]
             
             # Group by ID and mean (simple aggregation)
+            # 结果顺序由后续左连接决定，分组无需排序
             if numeric_cols:
-                grouped = layer_df.groupby(l_id_col)[numeric_cols].mean().reset_index()
+                grouped = layer_df.groupby(l_id_col, sort=False)[numeric_cols].mean().reset_index()
                 # Ensure ID types match (convert to string)
                 grouped[l_id_col] = grouped[l_id_col].astype(str)
                 coords_df['id'] = coords_df['id'].astype(str)
@@ -134,7 +198,7 @@ async def merge_data():
                 merged_df = pd.merge(coords_df, layer_df, left_on='id', right_on=l_id_col, how='left')
                 
             # Fill NaNs
-            merged_df = merged_df.replace({np.nan: 0})
+            merged_df.fillna(0, inplace=True)
             
             # Map common fields to standard names expected by frontend
             column_mapping = {
@@ -144,10 +208,15 @@ async def merge_data():
                 '地下水位': 'groundWater', 'water': 'groundWater'
             }
             
+            # 先确定 目标列 -> 源列 的映射（后匹配者优先，与逐列赋值等价），再一次性赋值
+            targets = {}
             for col in merged_df.columns:
+                col_lower = col.lower()
                 for k, v in column_mapping.items():
-                    if k in col.lower():
-                        merged_df[v] = merged_df[col]
+                    if k in col_lower:
+                        targets[v] = col
+            if targets:
+                merged_df = merged_df.assign(**{v: merged_df[col] for v, col in targets.items()})
                         
             # Ensure required columns exist (fill with defaults if missing)
             defaults = {'rockHardness': 5.0, 'gasContent': 2.0, 'coalThickness': 3.0, 'groundWater': 10.0}
@@ -160,45 +229,63 @@ async def merge_data():
             
         else:
             # No ID column found in layer data, fallback to random
-            merged = _generate_mock_data(store.borehole_coordinates)
+            merged = _generate_mock_data(coords)
             unmatched = []
-    else:
-        # No layer data, fallback to random
-        merged = _generate_mock_data(store.borehole_coordinates)
-        unmatched = []
 
-    store.boreholes = merged
-    _update_boundary_if_needed(merged)
+    await run_in_threadpool(_save_boreholes, merged)
     
     return {"success": True, "data": {"boreholes": merged, "count": len(merged)}, "unmatched": unmatched}
 
 def _generate_mock_data(coords):
-    merged = []
-    for c in coords:
-        merged.append({
+    # 一次生成全部随机数：列依次为 煤厚/瓦斯/硬度/水位/评分
+    offsets = np.array([15, 2, 4, 20, 70])
+    scales = np.array([10, 5, 4, 20, 20])
+    values = (offsets + np.random.random((len(coords), 5)) * scales).tolist()
+    return [
+        {
             "id": c['id'],
             "x": c['x'],
             "y": c['y'],
-            "coalThickness": 15 + np.random.random() * 10,
-            "gasContent": 2 + np.random.random() * 5,
-            "rockHardness": 4 + np.random.random() * 4,
-            "groundWater": 20 + np.random.random() * 20,
-            "avgScore": 70 + np.random.random() * 20
-        })
-    return merged
-
-def _update_boundary_if_needed(data):
-    if not store.boundary and data:
-        df = pd.DataFrame(data)
-        if 'x' in df.columns and 'y' in df.columns:
-            min_x, max_x = df['x'].min(), df['x'].max()
-            min_y, max_y = df['y'].min(), df['y'].max()
-            margin = (max_x - min_x) * 0.1
-            
-            store.boundary = [
-                {"x": min_x - margin, "y": min_y - margin},
-                {"x": max_x + margin, "y": min_y - margin},
-                {"x": max_x + margin, "y": max_y + margin},
-                {"x": min_x - margin, "y": max_y + margin},
-                {"x": min_x - margin, "y": min_y - margin}
-            ]
+            "coalThickness": v[0],
+            "gasContent": v[1],
+            "rockHardness": v[2],
+            "groundWater": v[3],
+            "avgScore": v[4]
+        }
+        for c, v in zip(coords, values)
+    ]
+
+def _save_boreholes(data):
+    """
+    保存钻孔数据；尚无采区边界时由钻孔范围生成默认边界，与钻孔在同一次提交中写入
+    （序列化与写库较耗时，由调用方放到线程池执行）
+    """
+    fields = {'boreholes': data}
+    boundary = _default_boundary(data) if not store.boundary else None
+    if boundary:
+        fields['boundary'] = boundary
+    store.update(**fields)
+
+
+def _default_boundary(data):
+    """以钻孔坐标范围外扩 10% 作为默认边界，无有效坐标时返回 None"""
+    if not data:
+        return None
+
+    # 单次遍历求坐标范围，无需构建 DataFrame
+    xs = [d['x'] for d in data if d.get('x') is not None]
+    ys = [d['y'] for d in data if d.get('y') is not None]
+    if not (xs and ys):
+        return None
+
+    min_x, max_x = min(xs), max(xs)
+    min_y, max_y = min(ys), max(ys)
+    margin = (max_x - min_x) * 0.1
+
+    return [
+        {"x": min_x - margin, "y": min_y - margin},
+        {"x": max_x + margin, "y": min_y - margin},
+        {"x": max_x + margin, "y": max_y + margin},
+        {"x": min_x - margin, "y": max_y + margin},
+        {"x": min_x - margin, "y": min_y - margin}
+    ]
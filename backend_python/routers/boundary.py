@@ -1,9 +1,15 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
+from utils.responses import json_response
 from store import store
+import numpy as np
 
 router = APIRouter()
 
 @router.get("/")
-async def get_boundary():
+async def get_boundary(format: str = Query('records', pattern='^(records|soa)$', description="records: [{x, y}, ...]（默认）; soa: {x: [...], y: [...]}，体积更小")):
     # 返回归一化后的边界坐标（与设计模块保持一致）
-    return {"boundary": store.get_normalized_boundary()}
+    if format == 'soa':
+        # 按列输出坐标数组，由 orjson 直接序列化（需为连续内存）
+        x, y = np.ascontiguousarray(store.get_normalized_boundary_xy().T)
+        return json_response({"boundary": {"x": x, "y": y}})
+    return json_response({"boundary": store.get_normalized_boundary()})
@@ -1,20 +1,57 @@
-from fastapi import APIRouter, HTTPException, Response, Body
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Request, Body, Query, Response
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field, validator
 from typing import Dict, Any, Optional, List
 from store import store
 from utils.algorithms import generate_smart_layout, generate_roadways
 from utils.mining_rules import MiningRules, DEFAULT_MINING_RULES
-from utils.geology_analysis import GeologyAnalyzer
+from utils.geology_analysis import GeologyAnalyzer, BoreholeGeology, CoalSeamInfo
+from utils.kernels import roadway_offsets
 import ezdxf
 from ezdxf import colors
 from ezdxf.enums import TextEntityAlignment
-from io import BytesIO
+from ezdxf.math import Vec3
+from io import BytesIO, TextIOWrapper
 import traceback
 import math
+from datetime import datetime
+import gzip
+import json
+import orjson
+from functools import lru_cache
+import numpy as np
 
 router = APIRouter()
 
+# 巷道类型 -> (图层, 巷道宽度m)
+ROADWAY_LAYER_WIDTHS = {
+    'main': ('主要巷道', 5.0),         # 主运输大巷
+    'ventilation': ('回风巷道', 4.5),  # 回风大巷
+    'transport': ('运输巷道', 4.0),    # 运输顺槽
+    'return': ('回采巷道', 4.0),       # 回风顺槽
+    'cut': ('开切眼', 6.0),            # 开切眼（较宽）
+}
+DEFAULT_ROADWAY_LAYER_WIDTH = ('联络巷', 3.5)  # 联络巷及其他类型
+
+# 常用实体属性（ezdxf 创建实体时会复制属性字典，可安全复用）
+DXFATTR_BOUNDARY = {'layer': '采区边界', 'const_width': 0.5}
+DXFATTR_WORKFACE = {'layer': '工作面边界', 'const_width': 0.35}
+DXFATTR_BOREHOLE_ID = {'layer': '钻孔标注', 'height': 4, 'style': 'MINING'}
+DXFATTR_BOREHOLE_THICK = {'layer': '钻孔标注', 'height': 3}
+DXFATTR_LABEL = {'layer': '文字标注', 'height': 8, 'style': 'MINING'}
+DXFATTR_NOTE = {'layer': '文字标注', 'height': 4}
+# 工作面参数多行标注：字高 4，行距 8（默认行距为 1.667 倍字高）
+DXFATTR_PANEL_INFO = {'layer': '文字标注', 'char_height': 4, 'line_spacing_factor': 1.2,
+                      'attachment_point': 1}  # 1 = 左上角对齐
+DXFATTR_FRAME = {'layer': '图框'}
+
+# DXF 导出缓存：设计/边界/钻孔数据未变化时直接返回上次生成的文件内容
+# bytes/gzip 按输出格式 (asc/bin) 分别缓存原始与压缩内容，数据变化时整体失效
+_dxf_cache: Dict[str, Any] = {"key": None, "bytes": {}, "gzip": {}}
+
+# 设计验证缓存：键为 (设计版本号, 规程参数JSON)
+_validation_cache: Dict[str, Any] = {"key": None, "result": None}
+
 
 # ============ 输入验证模型 ============
 
@@ -61,55 +98,79 @@ class DesignParams(BaseModel):
 
 # ============ 图层设置 ============
 
+# 煤矿CAD制图规范图层：(名称, 颜色, 线型, 线宽mm)
+MINING_LAYERS = (
+    # 边界类
+    ('采区边界', 7, 'CONTINUOUS', 0.5),      # 白色，粗实线
+    ('保护煤柱', 8, 'DASHED', 0.35),         # 灰色，虚线
+
+    # 巷道类 - 按照煤矿规范
+    ('主要巷道', 3, 'CONTINUOUS', 0.7),      # 绿色，粗实线 - 主运输大巷
+    ('回风巷道', 1, 'CONTINUOUS', 0.5),      # 红色，中实线 - 回风大巷
+    ('运输巷道', 4, 'CONTINUOUS', 0.35),     # 青色，细实线 - 顺槽运输巷
+    ('回采巷道', 6, 'CONTINUOUS', 0.35),     # 紫色，细实线 - 顺槽回风巷
+    ('开切眼', 5, 'CONTINUOUS', 0.35),       # 蓝色，细实线
+    ('联络巷', 8, 'CONTINUOUS', 0.25),       # 灰色，细实线
+
+    # 工作面类
+    ('回采工作面', 2, 'CONTINUOUS', 0.5),    # 黄色，中实线
+    ('工作面边界', 1, 'CONTINUOUS', 0.35),   # 红色，细实线
+    ('已采区', 8, 'CONTINUOUS', 0.25),       # 灰色填充区
+
+    # 钻孔类
+    ('钻孔', 4, 'CONTINUOUS', 0.25),         # 青色
+    ('钻孔标注', 7, 'CONTINUOUS', 0.18),     # 白色
+
+    # 标注类
+    ('尺寸标注', 7, 'CONTINUOUS', 0.18),     # 白色
+    ('文字标注', 7, 'CONTINUOUS', 0.25),     # 白色
+    ('图框', 7, 'CONTINUOUS', 0.5),          # 白色
+)
+
+# 自定义线型：(名称, 图案, 说明)
+MINING_LINETYPES = (
+    ('DASHED', [0.5, -0.25], 'Dashed line'),
+    ('CENTER', [1.25, -0.25, 0.25, -0.25], 'Center line'),
+)
+
 
 def setup_mining_layers(doc):
     """
     设置符合煤矿CAD制图规范的图层
     参考《煤矿采掘工程平面图》GB/T 12719-2021
     """
-    layers_config = [
-        # 边界类
-        ('采区边界', 7, 'CONTINUOUS', 0.5),      # 白色，粗实线
-        ('保护煤柱', 8, 'DASHED', 0.35),         # 灰色，虚线
-
-        # 巷道类 - 按照煤矿规范
-        ('主要巷道', 3, 'CONTINUOUS', 0.7),      # 绿色，粗实线 - 主运输大巷
-        ('回风巷道', 1, 'CONTINUOUS', 0.5),      # 红色，中实线 - 回风大巷
-        ('运输巷道', 4, 'CONTINUOUS', 0.35),     # 青色，细实线 - 顺槽运输巷
-        ('回采巷道', 6, 'CONTINUOUS', 0.35),     # 紫色，细实线 - 顺槽回风巷
-        ('开切眼', 5, 'CONTINUOUS', 0.35),       # 蓝色，细实线
-        ('联络巷', 8, 'CONTINUOUS', 0.25),       # 灰色，细实线
-
-        # 工作面类
-        ('回采工作面', 2, 'CONTINUOUS', 0.5),    # 黄色，中实线
-        ('工作面边界', 1, 'CONTINUOUS', 0.35),   # 红色，细实线
-        ('已采区', 8, 'CONTINUOUS', 0.25),       # 灰色填充区
-
-        # 钻孔类
-        ('钻孔', 4, 'CONTINUOUS', 0.25),         # 青色
-        ('钻孔标注', 7, 'CONTINUOUS', 0.18),     # 白色
-
-        # 标注类
-        ('尺寸标注', 7, 'CONTINUOUS', 0.18),     # 白色
-        ('文字标注', 7, 'CONTINUOUS', 0.25),     # 白色
-        ('图框', 7, 'CONTINUOUS', 0.5),          # 白色
-    ]
-
-    # 添加线型
-    doc.linetypes.add('DASHED', pattern=[0.5, -0.25], description='Dashed line')
-    doc.linetypes.add('CENTER', pattern=[1.25, -0.25, 0.25, -0.25], description='Center line')
-
-    for name, color, linetype, lineweight in layers_config:
-        if name not in doc.layers:
-            layer = doc.layers.add(name=name)
-            layer.color = color
-            layer.linetype = linetype if linetype in doc.linetypes else 'CONTINUOUS'
-            # lineweight in mm * 100
-            layer.dxf.lineweight = int(lineweight * 100)
+    # 添加线型（已存在则跳过）
+    for name, pattern, description in MINING_LINETYPES:
+        if name not in doc.linetypes:
+            doc.linetypes.add(name, pattern=pattern, description=description)
+
+    existing = {layer.dxf.name for layer in doc.layers}
+    for name, color, linetype, lineweight in MINING_LAYERS:
+        if name in existing:
+            continue
+        doc.layers.add(
+            name,
+            color=color,
+            linetype=linetype if linetype in doc.linetypes else 'CONTINUOUS',
+            lineweight=int(lineweight * 100),  # lineweight in mm * 100
+        )
 
     return doc
 
 
+def _fast_lwp(msp, points, layer, const_width=None):
+    """
+    直接构造 LWPOLYLINE 实体，跳过 add_lwpolyline 的属性校验与转换
+    用于巷道边线、工作面边界等批量生成的多段线
+    """
+    attribs = {'layer': layer}
+    if const_width is not None:
+        attribs['const_width'] = const_width
+    lwp = msp.new_entity('LWPOLYLINE', attribs)
+    lwp.set_points(points, format='xy')
+    return lwp
+
+
 def add_roadway_with_width(msp, path, width, layer, doc):
     """
     绘制带宽度的巷道（双线表示）
@@ -120,44 +181,19 @@ def add_roadway_with_width(msp, path, width, layer, doc):
 
     # 计算巷道中心线的偏移
     half_width = width / 2
+    pts = np.asarray(path, dtype=np.float64)
 
-    left_points = []
-    right_points = []
-
-    for i in range(len(path)):
-        if i == 0:
-            # 起点：使用第一段的方向
-            dx = path[1][0] - path[0][0]
-            dy = path[1][1] - path[0][1]
-        elif i == len(path) - 1:
-            # 终点：使用最后一段的方向
-            dx = path[-1][0] - path[-2][0]
-            dy = path[-1][1] - path[-2][1]
-        else:
-            # 中间点：使用前后两段的平均方向
-            dx = path[i+1][0] - path[i-1][0]
-            dy = path[i+1][1] - path[i-1][1]
-
-        length = math.sqrt(dx*dx + dy*dy)
-        if length > 0:
-            # 法向量（垂直于前进方向）
-            nx = -dy / length
-            ny = dx / length
-        else:
-            nx, ny = 0, 1
+    # 左右边线点
+    left, right = roadway_offsets(pts, half_width)
 
-        # 左右边线点
-        left_points.append((path[i][0] + nx * half_width, path[i][1] + ny * half_width))
-        right_points.append((path[i][0] - nx * half_width, path[i][1] - ny * half_width))
-
-    # 绘制左边线
-    msp.add_lwpolyline(left_points, dxfattribs={'layer': layer})
+    # 绘制左边线（ezdxf 直接逐行读取数组，无需先转成列表）
+    _fast_lwp(msp, left, layer)
     # 绘制右边线
-    msp.add_lwpolyline(right_points, dxfattribs={'layer': layer})
+    _fast_lwp(msp, right, layer)
 
     # 添加端部封闭线（巷道交叉口不封闭，这里简化处理只封闭端点）
-    # msp.add_line(left_points[0], right_points[0], dxfattribs={'layer': layer})
-    # msp.add_line(left_points[-1], right_points[-1], dxfattribs={'layer': layer})
+    # msp.add_line(left[0], right[0], dxfattribs={'layer': layer})
+    # msp.add_line(left[-1], right[-1], dxfattribs={'layer': layer})
 
 
 def add_workface_hatch(msp, points, doc, layer='回采工作面'):
@@ -225,7 +261,7 @@ def add_dimension(msp, start, end, offset, text, layer='尺寸标注'):
 
 
 @router.get("/export/dxf")
-async def export_dxf():
+async def export_dxf(request: Request, fmt: str = Query('asc', pattern='^(asc|bin)$', description="asc: ASCII DXF（默认）; bin: 二进制 DXF，体积更小")):
     """
     导出符合煤矿CAD制图规范的DXF文件
     """
@@ -233,328 +269,323 @@ async def export_dxf():
         if not store.design_result:
             raise HTTPException(status_code=400, detail="请先生成设计方案")
 
-        # 创建DXF文档，使用AutoCAD 2010格式以获得更好兼容性
-        doc = ezdxf.new(dxfversion='R2010')
-        msp = doc.modelspace()
+        cache_key = (
+            store.field_version('design_result'),
+            store.field_version('boundary'),
+            store.field_version('boreholes'),
+        )
+        if _dxf_cache["key"] != cache_key:
+            _dxf_cache["key"] = cache_key
+            _dxf_cache["bytes"] = {}
+            _dxf_cache["gzip"] = {}
+
+        dxf_bytes = _dxf_cache["bytes"].get(fmt)
+        if dxf_bytes is None:
+            # 生成DXF为 CPU 密集操作，放到线程池执行，避免阻塞事件循环
+            dxf_bytes = await run_in_threadpool(_build_dxf_bytes, fmt)
+            if _dxf_cache["key"] == cache_key:
+                _dxf_cache["bytes"][fmt] = dxf_bytes
+
+        # 客户端支持 gzip 时返回预压缩内容：同一版本只压缩一次，
+        # 已带 Content-Encoding 的响应 GZip 中间件会直接放行，不再重复压缩
+        if 'gzip' in request.headers.get('accept-encoding', ''):
+            compressed = _dxf_cache["gzip"].get(fmt)
+            if compressed is None:
+                compressed = await run_in_threadpool(gzip.compress, dxf_bytes, 6)
+                if _dxf_cache["key"] == cache_key:
+                    _dxf_cache["gzip"][fmt] = compressed
+            response = _download_response(compressed)
+            response.headers["Content-Encoding"] = "gzip"
+            response.headers["Vary"] = "Accept-Encoding"
+            return response
+
+        return _download_response(dxf_bytes)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"DXF 导出错误: {str(e)}")
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"DXF 导出失败: {str(e)}")
+
+
+@router.get("/export/json")
+async def export_json():
+    """
+    导出设计方案 JSON 文件（供程序读取几何数据，无需构建 DXF）
+    """
+    design_result = store.design_result
+    if not design_result:
+        raise HTTPException(status_code=400, detail="请先生成设计方案")
+
+    content = orjson.dumps(design_result, option=orjson.OPT_SERIALIZE_NUMPY)
+    return _download_response(content, media_type="application/json", ext="json")
+
+
+def _build_dxf_bytes(fmt: str = 'asc') -> bytes:
+    """
+    根据当前设计方案构建DXF文档并序列化为字节
+    （CPU 密集，由 export_dxf 放到线程池中执行）
+
+    Args:
+        fmt: 'asc' ASCII DXF（兼容性更好）; 'bin' 二进制 DXF（体积更小、序列化更快）
+    """
+    # 每次读取 store 属性都会查询数据库并反序列化，这里只读取一次
+    design_result = store.design_result
+    boundary_xy = store.boundary_xy
+    boreholes = store.boreholes
 
-        # 设置图层
-        setup_mining_layers(doc)
+    # 创建DXF文档，使用AutoCAD 2010格式以获得更好兼容性
+    doc = ezdxf.new(dxfversion='R2010')
+    msp = doc.modelspace()
 
-        # 设置文字样式 - 带fallback
+    # 设置图层
+    setup_mining_layers(doc)
+
+    # 设置文字样式 - 带fallback
+    try:
+        doc.styles.add('MINING', font='simhei.ttf')  # 优先使用黑体
+    except Exception:
         try:
-            doc.styles.add('MINING', font='simhei.ttf')  # 优先使用黑体
+            doc.styles.add('MINING', font='arial.ttf')  # fallback到Arial
         except Exception:
-            try:
-                doc.styles.add('MINING', font='arial.ttf')  # fallback到Arial
-            except Exception:
-                pass  # 使用默认字体
-
-        # ========== 绘制采区边界 ==========
-        if store.boundary:
-            points = [(p['x'], p['y']) for p in store.boundary]
-            if points:
-                points.append(points[0])  # 闭合
-                # 采区边界 - 粗实线
-                msp.add_lwpolyline(
-                    points,
-                    dxfattribs={
-                        'layer': '采区边界',
-                        'const_width': 0.5  # 线宽
-                    }
-                )
-
-                # 添加边界标注
-                msp.add_text(
-                    '采区边界',
-                    dxfattribs={
-                        'layer': '文字标注',
-                        'height': 8,
-                        'style': 'MINING'
-                    }
-                ).set_placement((points[0][0], points[0][1] + 15))
-
-        # ========== 绘制钻孔 ==========
-        if store.boreholes:
-            for b in store.boreholes:
-                x, y = b['x'], b['y']
-                bh_id = b.get('id', 'BH')
-
-                # 钻孔符号：同心圆（符合规范）
-                msp.add_circle((x, y), radius=3, dxfattribs={'layer': '钻孔'})
-                msp.add_circle((x, y), radius=1.5, dxfattribs={'layer': '钻孔'})
-                msp.add_point((x, y), dxfattribs={'layer': '钻孔'})
-
-                # 钻孔编号
-                msp.add_text(
-                    bh_id,
-                    dxfattribs={
-                        'layer': '钻孔标注',
-                        'height': 4,
-                        'style': 'MINING'
-                    }
-                ).set_placement((x + 5, y + 2))
-
-                # 如果有煤厚数据，标注
-                coal_thick = b.get('coalThickness', b.get('thickness'))
-                if coal_thick:
-                    msp.add_text(
-                        f'M={coal_thick:.1f}m',
-                        dxfattribs={
-                            'layer': '钻孔标注',
-                            'height': 3
-                        }
-                    ).set_placement((x + 5, y - 5))
-
-        # ========== 绘制巷道 ==========
-        roadways = store.design_result.get("roadways", [])
-        if roadways:
-            # 巷道宽度配置（米）
-            roadway_widths = {
-                'main': 5.0,       # 主运输大巷
-                'ventilation': 4.5, # 回风大巷
-                'transport': 4.0,   # 运输顺槽
-                'return': 4.0,      # 回风顺槽
-                'cut': 6.0,         # 开切眼（较宽）
-                'gate': 3.5         # 联络巷
+            pass  # 使用默认字体
+
+    # ========== 绘制采区边界 ==========
+    if len(boundary_xy):
+        first_x, first_y = boundary_xy[0].tolist()
+        # 采区边界 - 粗实线（首点追加到末尾闭合）
+        msp.add_lwpolyline(np.vstack([boundary_xy, boundary_xy[:1]]), dxfattribs=DXFATTR_BOUNDARY)
+
+        # 添加边界标注
+        msp.add_text('采区边界', dxfattribs=DXFATTR_LABEL).set_placement((first_x, first_y + 15))
+
+    # ========== 绘制钻孔 ==========
+    if boreholes:
+        for b in boreholes:
+            x, y = b['x'], b['y']
+            bh_id = b.get('id', 'BH')
+
+            # 钻孔符号：同心圆（符合规范），直接创建实体，省去 add_* 的参数转换
+            center = Vec3(x, y)
+            msp.new_entity('CIRCLE', {'layer': '钻孔', 'center': center, 'radius': 3.0})
+            msp.new_entity('CIRCLE', {'layer': '钻孔', 'center': center, 'radius': 1.5})
+            msp.new_entity('POINT', {'layer': '钻孔', 'location': center})
+
+            # 钻孔编号
+            msp.add_text(bh_id, dxfattribs=DXFATTR_BOREHOLE_ID).set_placement((x + 5, y + 2))
+
+            # 如果有煤厚数据，标注
+            coal_thick = b.get('coalThickness', b.get('thickness'))
+            if coal_thick:
+                msp.add_text(f'M={coal_thick:.1f}m', dxfattribs=DXFATTR_BOREHOLE_THICK).set_placement((x + 5, y - 5))
+
+    # ========== 绘制巷道 ==========
+    # 先集中计算所有巷道的图层、宽度与标注参数，绘制循环只负责创建实体
+    for road in _prepare_roadways(design_result.get("roadways", [])):
+        # 绘制双线巷道
+        add_roadway_with_width(msp, road['path'], road['width'], road['layer'], doc)
+
+        # 巷道中心线（用于标注）
+        # msp.add_lwpolyline(path, dxfattribs={'layer': layer, 'linetype': 'CENTER'})
+
+        # 添加巷道名称标注
+        msp.add_text(
+            road['name'],
+            dxfattribs={
+                'layer': '文字标注',
+                'height': road['text_height'],
+                'rotation': road['angle'],
+                'style': 'MINING'
             }
-
-            for r in roadways:
-                road_path = r.get('path', [])
-                if len(road_path) >= 2:
-                    path = [(pt['x'], pt['y']) for pt in road_path]
-                    road_type = r.get('type', 'gate')
-                    road_name = r.get('name', r.get('id', ''))
-
-                    # 确定图层和宽度
-                    if road_type == 'main':
-                        layer = '主要巷道'
-                        width = roadway_widths['main']
-                    elif road_type == 'ventilation':
-                        layer = '回风巷道'
-                        width = roadway_widths['ventilation']
-                    elif road_type == 'transport':
-                        layer = '运输巷道'
-                        width = roadway_widths['transport']
-                    elif road_type in ['return']:
-                        layer = '回采巷道'
-                        width = roadway_widths['return']
-                    elif road_type == 'cut':
-                        layer = '开切眼'
-                        width = roadway_widths['cut']
-                    else:
-                        layer = '联络巷'
-                        width = roadway_widths['gate']
-
-                    # 绘制双线巷道
-                    add_roadway_with_width(msp, path, width, layer, doc)
-
-                    # 巷道中心线（用于标注）
-                    # msp.add_lwpolyline(path, dxfattribs={'layer': layer, 'linetype': 'CENTER'})
-
-                    # 添加巷道名称标注
-                    mid_x = (path[0][0] + path[-1][0]) / 2
-                    mid_y = (path[0][1] + path[-1][1]) / 2
-
-                    # 计算文字角度
-                    dx = path[-1][0] - path[0][0]
-                    dy = path[-1][1] - path[0][1]
-                    angle = math.degrees(math.atan2(dy, dx))
-                    if angle < -90 or angle > 90:
-                        angle += 180
-
-                    # 主巷道标注更大
-                    text_height = 6 if road_type == 'main' else 4
-
-                    msp.add_text(
-                        road_name,
-                        dxfattribs={
-                            'layer': '文字标注',
-                            'height': text_height,
-                            'rotation': angle,
-                            'style': 'MINING'
-                        }
-                    ).set_placement((mid_x, mid_y + width), align=TextEntityAlignment.MIDDLE_CENTER)
-
-        # ========== 绘制工作面 ==========
-        panels = store.design_result.get("panels", []) or store.design_result.get("workfaces", [])
-        if panels:
-            for idx, p in enumerate(panels):
-                panel_points = p.get('points', [])
-                if panel_points:
-                    points = [(pt['x'], pt['y']) for pt in panel_points]
-
-                    is_valid = p.get('isValid', True)
-                    layer = '工作面边界' if is_valid else '工作面边界'
-
-                    # 工作面边界线
-                    closed_points = points + [points[0]]
-                    msp.add_lwpolyline(
-                        closed_points,
-                        dxfattribs={
-                            'layer': layer,
-                            'const_width': 0.35
-                        }
-                    )
-
-                    # 工作面填充（斜线表示回采区）
-                    # add_workface_hatch(msp, points, doc)
-
-                    # 工作面编号标注
-                    center_x = p.get('center_x', sum(pt[0] for pt in points) / len(points))
-                    center_y = p.get('center_y', sum(pt[1] for pt in points) / len(points))
-
-                    wf_id = p.get('id', f'WF-{idx+1:02d}')
-
-                    # 工作面名称（较大字体）
-                    msp.add_text(
-                        wf_id,
-                        dxfattribs={
-                            'layer': '文字标注',
-                            'height': 8,
-                            'style': 'MINING'
-                        }
-                    ).set_placement((center_x, center_y), align=TextEntityAlignment.MIDDLE_CENTER)
-
-                    # 工作面参数标注
-                    face_len = p.get('faceLength', p.get('length', 0))
-                    advance_len = p.get('advanceLength', p.get('width', 0))
-                    score = p.get('avgScore', 0)
-
-                    info_text = f'工作面长度:{face_len:.0f}m'
-                    msp.add_text(
-                        info_text,
-                        dxfattribs={
-                            'layer': '文字标注',
-                            'height': 4
-                        }
-                    ).set_placement((center_x, center_y - 12))
-
-                    info_text2 = f'推进长度:{advance_len:.0f}m'
-                    msp.add_text(
-                        info_text2,
-                        dxfattribs={
-                            'layer': '文字标注',
-                            'height': 4
-                        }
-                    ).set_placement((center_x, center_y - 20))
-
-                    # 不符合规程的警告
-                    if not is_valid:
-                        msg = p.get('validationMsg', '不符合规程')
-                        msp.add_text(
-                            f'※{msg}',
-                            dxfattribs={
-                                'layer': '文字标注',
-                                'height': 3,
-                                'color': 1  # 红色
-                            }
-                        ).set_placement((center_x, center_y - 28))
-
-        # ========== 添加图例和图框 ==========
-        # 计算图纸范围
-        all_points = []
-        if store.boundary:
-            all_points.extend([(p['x'], p['y']) for p in store.boundary])
-
-        if all_points:
-            min_x = min(p[0] for p in all_points) - 100
-            min_y = min(p[1] for p in all_points) - 100
-            max_x = max(p[0] for p in all_points) + 100
-            max_y = max(p[1] for p in all_points) + 100
-
-            # 图例位置（右下角）
-            legend_x = max_x - 80
-            legend_y = min_y + 20
-
-            # 图例框
-            msp.add_lwpolyline([
-                (legend_x, legend_y),
-                (legend_x + 70, legend_y),
-                (legend_x + 70, legend_y + 80),
-                (legend_x, legend_y + 80),
-                (legend_x, legend_y)
-            ], dxfattribs={'layer': '图框'})
-
-            msp.add_text('图 例', dxfattribs={'layer': '文字标注', 'height': 5}).set_placement(
-                (legend_x + 35, legend_y + 72), align=TextEntityAlignment.MIDDLE_CENTER)
-
-            # 图例项
-            legend_items = [
-                ('主运输大巷', '主要巷道', legend_y + 58),
-                ('回风大巷', '回风巷道', legend_y + 46),
-                ('运输顺槽', '运输巷道', legend_y + 34),
-                ('开切眼', '开切眼', legend_y + 22),
-                ('工作面', '工作面边界', legend_y + 10),
+        ).set_placement(road['label_pos'], align=TextEntityAlignment.MIDDLE_CENTER)
+
+    # ========== 绘制工作面 ==========
+    panels = design_result.get("panels", []) or design_result.get("workfaces", [])
+    if panels:
+        for idx, p in enumerate(panels):
+            panel_points = p.get('points', [])
+            if panel_points:
+                points = np.asarray([(pt['x'], pt['y']) for pt in panel_points], dtype=np.float64)
+
+                is_valid = p.get('isValid', True)
+
+                # 工作面边界线
+                closed_points = np.vstack([points, points[:1]])
+                _fast_lwp(msp, closed_points, **DXFATTR_WORKFACE)
+
+                # 工作面填充（斜线表示回采区）
+                # add_workface_hatch(msp, points, doc)
+
+                # 工作面编号标注
+                # 布局结果自带中心点，仅在缺失时才计算顶点均值
+                center_x = p.get('center_x')
+                center_y = p.get('center_y')
+                if center_x is None or center_y is None:
+                    mean_x, mean_y = points.mean(axis=0).tolist()
+                    center_x = mean_x if center_x is None else center_x
+                    center_y = mean_y if center_y is None else center_y
+
+                wf_id = p.get('id', f'WF-{idx+1:02d}')
+
+                # 工作面名称（较大字体）
+                msp.add_text(wf_id, dxfattribs=DXFATTR_LABEL).set_placement(
+                    (center_x, center_y), align=TextEntityAlignment.MIDDLE_CENTER)
+
+                # 工作面参数标注
+                face_len = p.get('faceLength', p.get('length', 0))
+                advance_len = p.get('advanceLength', p.get('width', 0))
+                score = p.get('avgScore', 0)
+
+                # 参数标注与违规警告合并为一个多行文字实体（\P 换行），
+                # 顶部对齐点放在首行基线上方一个字高处，与原单行文字位置一致
+                info_lines = [f'工作面长度:{face_len:.0f}m', f'推进长度:{advance_len:.0f}m']
+                # 不符合规程的警告（红色、字高 3）
+                if not is_valid:
+                    msg = p.get('validationMsg', '不符合规程')
+                    info_lines.append(f'{{\\C1;\\H0.75x;※{msg}}}')
+                msp.add_mtext('\\P'.join(info_lines), dxfattribs=DXFATTR_PANEL_INFO).set_location(
+                    (center_x, center_y - 8))
+
+    # ========== 添加图例和图框 ==========
+    # 计算图纸范围
+    if len(boundary_xy):
+        min_x, min_y = (boundary_xy.min(axis=0) - 100).tolist()
+        max_x, max_y = (boundary_xy.max(axis=0) + 100).tolist()
+
+        # 图例位置（右下角）
+        legend_x = max_x - 80
+        legend_y = min_y + 20
+
+        # 图例框
+        msp.add_lwpolyline([
+            (legend_x, legend_y),
+            (legend_x + 70, legend_y),
+            (legend_x + 70, legend_y + 80),
+            (legend_x, legend_y + 80),
+            (legend_x, legend_y)
+        ], dxfattribs=DXFATTR_FRAME)
+
+        msp.add_text('图 例', dxfattribs={'layer': '文字标注', 'height': 5}).set_placement(
+            (legend_x + 35, legend_y + 72), align=TextEntityAlignment.MIDDLE_CENTER)
+
+        # 图例项
+        legend_items = [
+            ('主运输大巷', '主要巷道', legend_y + 58),
+            ('回风大巷', '回风巷道', legend_y + 46),
+            ('运输顺槽', '运输巷道', legend_y + 34),
+            ('开切眼', '开切眼', legend_y + 22),
+            ('工作面', '工作面边界', legend_y + 10),
+        ]
+
+        legend_text_attribs = {'layer': '文字标注', 'height': 3}
+        for name, layer_name, y in legend_items:
+            # 示例线
+            msp.add_line((legend_x + 5, y), (legend_x + 25, y), dxfattribs={'layer': layer_name})
+            # 文字
+            msp.add_text(name, dxfattribs=legend_text_attribs).set_placement((legend_x + 28, y - 1))
+
+        # 添加比例尺
+        scale_y = min_y + 10
+        scale_len = 100  # 100米
+        msp.add_line((min_x + 20, scale_y), (min_x + 20 + scale_len, scale_y), dxfattribs=DXFATTR_FRAME)
+        msp.add_line((min_x + 20, scale_y - 2), (min_x + 20, scale_y + 2), dxfattribs=DXFATTR_FRAME)
+        msp.add_line((min_x + 20 + scale_len, scale_y - 2), (min_x + 20 + scale_len, scale_y + 2), dxfattribs=DXFATTR_FRAME)
+        msp.add_text(f'{scale_len}m', dxfattribs=DXFATTR_NOTE).set_placement(
+            (min_x + 20 + scale_len/2, scale_y + 5), align=TextEntityAlignment.MIDDLE_CENTER)
+
+        # 添加标题
+        title_x = (min_x + max_x) / 2
+        title_y = max_y - 20
+        msp.add_text(
+            '采区工作面布置图',
+            dxfattribs={
+                'layer': '文字标注',
+                'height': 15,
+                'style': 'MINING'
+            }
+        ).set_placement((title_x, title_y), align=TextEntityAlignment.MIDDLE_CENTER)
+
+        # 统计信息
+        stats = design_result.get('stats', {})
+        if stats:
+            info_y = max_y - 45
+            info_lines = [
+                f"工作面数量: {stats.get('count', len(panels))} 个",
+                f"平均工作面长度: {stats.get('avgFaceLength', 0):.0f} m",
+                f"平均推进长度: {stats.get('avgAdvanceLength', 0):.0f} m",
+                f"开采方式: {stats.get('miningMethod', '长壁后退式')}"
             ]
+            for i, line in enumerate(info_lines):
+                msp.add_text(line, dxfattribs=DXFATTR_NOTE).set_placement((min_x + 20, info_y - i * 8))
 
-            for name, layer_name, y in legend_items:
-                # 示例线
-                msp.add_line((legend_x + 5, y), (legend_x + 25, y), dxfattribs={'layer': layer_name})
-                # 文字
-                msp.add_text(name, dxfattribs={'layer': '文字标注', 'height': 3}).set_placement((legend_x + 28, y - 1))
-
-            # 添加比例尺
-            scale_y = min_y + 10
-            scale_len = 100  # 100米
-            msp.add_line((min_x + 20, scale_y), (min_x + 20 + scale_len, scale_y), dxfattribs={'layer': '图框'})
-            msp.add_line((min_x + 20, scale_y - 2), (min_x + 20, scale_y + 2), dxfattribs={'layer': '图框'})
-            msp.add_line((min_x + 20 + scale_len, scale_y - 2), (min_x + 20 + scale_len, scale_y + 2), dxfattribs={'layer': '图框'})
-            msp.add_text(f'{scale_len}m', dxfattribs={'layer': '文字标注', 'height': 4}).set_placement(
-                (min_x + 20 + scale_len/2, scale_y + 5), align=TextEntityAlignment.MIDDLE_CENTER)
-
-            # 添加标题
-            title_x = (min_x + max_x) / 2
-            title_y = max_y - 20
-            msp.add_text(
-                '采区工作面布置图',
-                dxfattribs={
-                    'layer': '文字标注',
-                    'height': 15,
-                    'style': 'MINING'
-                }
-            ).set_placement((title_x, title_y), align=TextEntityAlignment.MIDDLE_CENTER)
-
-            # 统计信息
-            stats = store.design_result.get('stats', {})
-            if stats:
-                info_y = max_y - 45
-                info_lines = [
-                    f"工作面数量: {stats.get('count', len(panels))} 个",
-                    f"平均工作面长度: {stats.get('avgFaceLength', 0):.0f} m",
-                    f"平均推进长度: {stats.get('avgAdvanceLength', 0):.0f} m",
-                    f"开采方式: {stats.get('miningMethod', '长壁后退式')}"
-                ]
-                for i, line in enumerate(info_lines):
-                    msp.add_text(
-                        line,
-                        dxfattribs={'layer': '文字标注', 'height': 4}
-                    ).set_placement((min_x + 20, info_y - i * 8))
-
-        # 导出到字节流 - 使用正确的编码方式
-        from datetime import datetime
+    if fmt == 'bin':
         byte_stream = BytesIO()
-        doc.write(byte_stream, fmt='asc')  # ASCII格式，兼容性更好
-        byte_stream.seek(0)
-
-        # 生成带时间戳的文件名
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"mining_design_{timestamp}.dxf"
-
-        return StreamingResponse(
-            byte_stream,
-            media_type="application/dxf",
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}",
-                "Access-Control-Expose-Headers": "Content-Disposition"
-            }
-        )
+        doc.write(byte_stream, fmt='bin')
+        return byte_stream.getvalue()
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"DXF 导出错误: {str(e)}")
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"DXF 导出失败: {str(e)}")
+    # 导出为ASCII格式（兼容性更好），写入时按文档编码逐块转为字节，不保留完整的中间字符串
+    byte_stream = BytesIO()
+    text_stream = TextIOWrapper(byte_stream, encoding=doc.output_encoding, errors='dxfreplace', newline='\n')
+    doc.write(text_stream, fmt='asc')
+    text_stream.flush()
+
+    return byte_stream.getvalue()
+
+
+def _prepare_roadways(roadways: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    预先计算巷道绘制参数（图层、宽度、名称标注位置与角度）
+
+    与 ezdxf 实体创建分离，标注中点与角度对所有巷道一次性向量化计算
+    """
+    valid = [r for r in roadways if len(r.get('path', [])) >= 2]
+    if not valid:
+        return []
+
+    paths = [[(pt['x'], pt['y']) for pt in r['path']] for r in valid]
+    starts = np.array([path[0] for path in paths], dtype=np.float64)
+    ends = np.array([path[-1] for path in paths], dtype=np.float64)
+
+    # 名称标注位于首末点中点；文字角度翻转到 [-90, 90] 区间内，保持文字正向
+    mids = ((starts + ends) / 2).tolist()
+    delta = ends - starts
+    angles = np.degrees(np.arctan2(delta[:, 1], delta[:, 0]))
+    angles = np.where(np.abs(angles) > 90, angles + 180, angles).tolist()
+
+    prepared = []
+    for r, path, (mid_x, mid_y), angle in zip(valid, paths, mids, angles):
+        road_type = r.get('type', 'gate')
+
+        # 确定图层和宽度
+        layer, width = ROADWAY_LAYER_WIDTHS.get(road_type, DEFAULT_ROADWAY_LAYER_WIDTH)
+
+        prepared.append({
+            'path': path,
+            'layer': layer,
+            'width': width,
+            'name': r.get('name', r.get('id', '')),
+            'label_pos': (mid_x, mid_y + width),
+            'angle': angle,
+            # 主巷道标注更大
+            'text_height': 6 if road_type == 'main' else 4,
+        })
+    return prepared
+
+
+def _download_response(content: bytes, media_type: str = "application/dxf", ext: str = "dxf") -> Response:
+    """构造设计文件下载响应（文件名带时间戳；内容已完整在内存中，直接整体返回，Content-Length 自动设置）"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"mining_design_{timestamp}.{ext}"
+
+    return Response(
+        content,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Access-Control-Expose-Headers": "Content-Disposition"
+        }
+    )
 
 
 @router.post("/")
@@ -574,20 +605,22 @@ async def generate_design(params: DesignParams):
     user_edits = params.userEdits or {}
     manual_roadways = user_edits.get("roadways", [])
 
-    # 构建规程配置
-    mining_rules = MiningRules()
+    # 构建规程配置（MiningRules 不可变，先收集覆盖项再一次构造）
+    rule_overrides = {}
 
     # 工作面长度约束
     if params.miningRules and params.miningRules.faceLength:
         fl = params.miningRules.faceLength
-        mining_rules.face_length_min = fl.min
-        mining_rules.face_length_max = fl.max
+        rule_overrides['face_length_min'] = fl.min
+        rule_overrides['face_length_max'] = fl.max
         if fl.preferred:
-            mining_rules.face_length_preferred = fl.preferred
+            rule_overrides['face_length_preferred'] = fl.preferred
 
     # 布置方向
     if params.miningRules:
-        mining_rules.layout_direction = params.miningRules.layoutDirection
+        rule_overrides['layout_direction'] = params.miningRules.layoutDirection
+
+    mining_rules = MiningRules(**rule_overrides)
 
     # 获取煤层倾角
     dip_angle = params.dipAngle
@@ -609,7 +642,9 @@ async def generate_design(params: DesignParams):
     print(f"  - 煤层倾角: {dip_angle}°, 倾向: {dip_direction}°")
 
     # 生成设计（使用归一化后的边界）
-    result = generate_smart_layout(
+    # 布局计算为 CPU 密集操作，放到线程池执行
+    result = await run_in_threadpool(
+        generate_smart_layout,
         boundary_points=normalized_boundary,
         dip_angle=dip_angle,
         dip_direction=dip_direction,
@@ -626,6 +661,10 @@ async def generate_design(params: DesignParams):
     roadways = result.get("roadways", [])
     stats = result.get("stats", {})
 
+    # 巷道总长度（m），对长度数组一次求和
+    road_lengths = np.fromiter((r.get('length', 0) for r in roadways), dtype=np.float64, count=len(roadways))
+    stats["totalRoadwayLength"] = round(float(road_lengths.sum()), 1)
+
     print(f"生成 {len(panels)} 个工作面，{len(roadways)} 条巷道")
 
     # 保存结果
@@ -671,13 +710,21 @@ async def get_mining_rules():
 @router.post("/validate")
 async def validate_design(params: Dict[str, Any] = Body(...)):
     """验证设计方案是否符合规程"""
-    if not store.design_result:
+    design_result = store.design_result
+    if not design_result:
         raise HTTPException(status_code=400, detail="请先生成设计方案")
 
-    panels = store.design_result.get("panels", [])
-    rules = MiningRules.from_dict(params.get("miningRules", {}))
+    # 设计方案与规程参数均未变化时直接返回上次的验证结果
+    rules_key = json.dumps(params.get("miningRules", {}), sort_keys=True, ensure_ascii=False)
+    cache_key = (store.field_version('design_result'), rules_key)
+    if _validation_cache["key"] == cache_key:
+        return _validation_cache["result"]
+
+    panels = design_result.get("panels", [])
+    rules = _rules_from_json(rules_key)
 
     validation_results = []
+    valid_count = 0
     for panel in panels:
         result = {
             "id": panel["id"],
@@ -696,17 +743,25 @@ async def validate_design(params: Dict[str, Any] = Body(...)):
         if not valid:
             result["issues"].append(msg)
 
-        result["isValid"] = len(result["issues"]) == 0
+        result["isValid"] = not result["issues"]
+        valid_count += result["isValid"]
         validation_results.append(result)
 
-    valid_count = sum(1 for r in validation_results if r["isValid"])
-
-    return {
+    result = {
         "totalPanels": len(panels),
         "validPanels": valid_count,
         "invalidPanels": len(panels) - valid_count,
         "details": validation_results
     }
+    _validation_cache["key"] = cache_key
+    _validation_cache["result"] = result
+    return result
+
+
+@lru_cache(maxsize=32)
+def _rules_from_json(rules_json: str) -> MiningRules:
+    """按规程参数的 JSON 串缓存解析结果（返回实例仅用于只读验证）"""
+    return MiningRules.from_dict(json.loads(rules_json))
 
 
 def _create_simple_geology_analyzer(boreholes: list) -> GeologyAnalyzer:
@@ -715,8 +770,6 @@ def _create_simple_geology_analyzer(boreholes: list) -> GeologyAnalyzer:
 
     这是一个简化版本，主要用于评分计算
     """
-    from utils.geology_analysis import GeologyAnalyzer, BoreholeGeology, CoalSeamInfo
-
     analyzer = GeologyAnalyzer()
 
     for bh in boreholes:
@@ -1,11 +1,30 @@
 from fastapi import APIRouter, HTTPException
+from utils.responses import json_response
 from store import store
 import numpy as np
-from scipy.interpolate import griddata
+from scipy.interpolate import CloughTocher2DInterpolator
+from scipy.spatial import Delaunay
+from utils.kernels import barycentric_interpolate
 import pandas as pd
+from functools import lru_cache
 
 router = APIRouter()
 
+# 典型的煤矿地层序列（从上到下），用于生成模拟分层
+TYPICAL_SEQUENCE = (
+    {'name': '第四系', 'ratio': 0.15, 'is_coal': False},
+    {'name': '砂岩', 'ratio': 0.20, 'is_coal': False},
+    {'name': '泥岩', 'ratio': 0.12, 'is_coal': False},
+    {'name': '粉砂岩', 'ratio': 0.10, 'is_coal': False},
+    {'name': '炭质泥岩', 'ratio': 0.08, 'is_coal': False},
+    {'name': '煤层', 'ratio': 0.10, 'is_coal': True},  # 煤层
+    {'name': '泥岩', 'ratio': 0.10, 'is_coal': False},
+    {'name': '细砂岩', 'ratio': 0.08, 'is_coal': False},
+    {'name': '粉砂岩', 'ratio': 0.07, 'is_coal': False},
+)
+SEQUENCE_RATIOS = np.array([seq['ratio'] for seq in TYPICAL_SEQUENCE])
+SEQUENCE_IS_COAL = np.array([seq['is_coal'] for seq in TYPICAL_SEQUENCE])
+
 
 @router.get("/layers")
 async def get_borehole_layers():
@@ -19,7 +38,44 @@ async def get_borehole_layers():
             return _generate_mock_layers()
         raise HTTPException(status_code=400, detail="缺少钻孔分层数据")
 
-    # 解析分层数据
+    # 分层解析结果按数据版本缓存，这里只需附加钻孔坐标
+    has_id, sequences = _build_layer_sequences(store.field_version('borehole_layer_data'))
+
+    # 获取钻孔坐标（优先使用坐标表，其次合并后的钻孔数据）；无编号列时无法关联
+    coords = {}
+    if has_id:
+        coords = {str(c.get('id', '')): (c.get('x', 0), c.get('y', 0))
+                  for c in store.borehole_coordinates or store.boreholes}
+
+    boreholes_data = []
+    for bh_id_str, layers in sequences:
+        x, y = coords.get(bh_id_str, (0, 0))
+        boreholes_data.append({
+            'id': bh_id_str,
+            'x': x,
+            'y': y,
+            'total_depth': layers[-1]['bottom_depth'],
+            'layers': layers
+        })
+
+    return json_response({
+        'boreholes': boreholes_data,
+        'count': len(boreholes_data),
+        'total_layers': sum(len(layers) for _, layers in sequences)
+    })
+
+
+@lru_cache(maxsize=1)
+def _build_layer_sequences(version: int) -> tuple:
+    """
+    解析分层数据，构建各钻孔自上而下的分层序列
+
+    分层数据只在上传时变化，结果按数据版本号缓存，
+    重复请求不再重建 DataFrame、识别列名和处理字符串列
+
+    Returns:
+        (是否有钻孔编号列, ((钻孔编号, 分层列表), ...))
+    """
     df = pd.DataFrame(store.borehole_layer_data)
 
     # 查找关键列
@@ -35,146 +91,87 @@ async def get_borehole_layers():
     if not name_col or not thick_col:
         raise HTTPException(status_code=400, detail="分层数据缺少必要列(名称/厚度)")
 
-    # 获取钻孔坐标
-    coords = {}
-    if store.borehole_coordinates:
-        for c in store.borehole_coordinates:
-            coords[str(c.get('id', ''))] = {'x': c.get('x', 0), 'y': c.get('y', 0)}
-    elif store.boreholes:
-        for b in store.boreholes:
-            coords[str(b.get('id', ''))] = {'x': b.get('x', 0), 'y': b.get('y', 0)}
+    # 逐列解析名称与厚度，只保留厚度大于 0 的分层
+    names = df[name_col].astype(object).where(df[name_col].notna(), '未知').astype(str).str.strip()
+    layers_df = pd.DataFrame({
+        'name': names,
+        'thickness': pd.to_numeric(df[thick_col], errors='coerce').fillna(0.0),
+        'is_coal': names.str.contains('煤', regex=False),
+    })
+    # 没有ID列时当作单个钻孔
+    layers_df['_bh'] = df[id_col] if id_col else 'BH-1'
+    layers_df = layers_df[layers_df['thickness'] > 0]
+
+    # 各钻孔内自上而下累计深度：底深为厚度累加，顶深为上一层底深
+    bottom = layers_df.groupby('_bh', sort=False)['thickness'].cumsum()
+    layers_df['top_depth'] = bottom.groupby(layers_df['_bh'], sort=False).shift(fill_value=0.0)
+    layers_df['bottom_depth'] = bottom
 
     # 按钻孔分组，构建分层序列
-    boreholes_data = []
-
-    if id_col:
-        grouped = df.groupby(id_col)
-        for bh_id, group in grouped:
-            bh_id_str = str(bh_id)
-            coord = coords.get(bh_id_str, {'x': 0, 'y': 0})
-
-            layers = []
-            current_depth = 0
-
-            for _, row in group.iterrows():
-                layer_name = str(row[name_col]).strip() if pd.notna(row[name_col]) else '未知'
-                thickness = float(row[thick_col]) if pd.notna(row[thick_col]) else 0
-
-                if thickness > 0:
-                    layers.append({
-                        'name': layer_name,
-                        'thickness': thickness,
-                        'top_depth': current_depth,
-                        'bottom_depth': current_depth + thickness,
-                        'is_coal': '煤' in layer_name
-                    })
-                    current_depth += thickness
-
-            if layers:
-                boreholes_data.append({
-                    'id': bh_id_str,
-                    'x': coord['x'],
-                    'y': coord['y'],
-                    'total_depth': current_depth,
-                    'layers': layers
-                })
-    else:
-        # 没有ID列，当作单个钻孔
-        layers = []
-        current_depth = 0
-
-        for _, row in df.iterrows():
-            layer_name = str(row[name_col]).strip() if pd.notna(row[name_col]) else '未知'
-            thickness = float(row[thick_col]) if pd.notna(row[thick_col]) else 0
-
-            if thickness > 0:
-                layers.append({
-                    'name': layer_name,
-                    'thickness': thickness,
-                    'top_depth': current_depth,
-                    'bottom_depth': current_depth + thickness,
-                    'is_coal': '煤' in layer_name
-                })
-                current_depth += thickness
-
-        if layers:
-            boreholes_data.append({
-                'id': 'BH-1',
-                'x': 0,
-                'y': 0,
-                'total_depth': current_depth,
-                'layers': layers
-            })
-
-    return {
-        'boreholes': boreholes_data,
-        'count': len(boreholes_data),
-        'total_layers': sum(len(b['layers']) for b in boreholes_data)
-    }
+    layer_columns = ['name', 'thickness', 'top_depth', 'bottom_depth', 'is_coal']
+    sequences = tuple(
+        (str(bh_id), group[layer_columns].to_dict('records'))
+        for bh_id, group in layers_df.groupby('_bh')
+    )
+    return bool(id_col), sequences
 
 
 def _generate_mock_layers():
     """
     当没有真实分层数据时，根据钻孔数据生成模拟分层
+    所有钻孔的各层厚度与深度一次性按 (钻孔数, 层数) 数组计算
     """
-    boreholes_data = []
-
-    # 定义典型的煤矿地层序列（从上到下）
-    typical_sequence = [
-        {'name': '第四系', 'ratio': 0.15, 'is_coal': False},
-        {'name': '砂岩', 'ratio': 0.20, 'is_coal': False},
-        {'name': '泥岩', 'ratio': 0.12, 'is_coal': False},
-        {'name': '粉砂岩', 'ratio': 0.10, 'is_coal': False},
-        {'name': '炭质泥岩', 'ratio': 0.08, 'is_coal': False},
-        {'name': '煤层', 'ratio': 0.10, 'is_coal': True},  # 煤层
-        {'name': '泥岩', 'ratio': 0.10, 'is_coal': False},
-        {'name': '细砂岩', 'ratio': 0.08, 'is_coal': False},
-        {'name': '粉砂岩', 'ratio': 0.07, 'is_coal': False},
+    boreholes = store.boreholes
+    coal_thickness = np.array(
+        [float(bh.get('coalThickness', bh.get('thickness', 3))) for bh in boreholes], dtype=np.float64)
+
+    # 第 0 列用于总深度，其余各列对应地层序列中每一层的随机变化
+    rand = np.random.random((len(boreholes), 1 + len(TYPICAL_SEQUENCE)))
+
+    # 假设总深度是煤厚的10-15倍
+    total_depth = coal_thickness * (10 + rand[:, 0] * 5)
+
+    # 煤层厚度取钻孔煤厚，其余按比例和一些随机变化计算厚度
+    thickness = np.where(
+        SEQUENCE_IS_COAL,
+        coal_thickness[:, None],
+        total_depth[:, None] * SEQUENCE_RATIOS * (0.8 + rand[:, 1:] * 0.4)
+    )
+    bottom = np.cumsum(thickness, axis=1)
+    top = bottom - thickness
+
+    thickness_rows = np.round(thickness, 2).tolist()
+    top_rows = np.round(top, 2).tolist()
+    bottom_rows = np.round(bottom, 2).tolist()
+    total_depths = np.round(bottom[:, -1], 2).tolist()
+
+    boreholes_data = [
+        {
+            'id': str(bh.get('id', 'unknown')),
+            'x': float(bh.get('x', 0)),
+            'y': float(bh.get('y', 0)),
+            'total_depth': total,
+            'layers': [
+                {
+                    'name': seq['name'],
+                    'thickness': t,
+                    'top_depth': top_depth,
+                    'bottom_depth': bottom_depth,
+                    'is_coal': seq['is_coal']
+                }
+                for seq, t, top_depth, bottom_depth in zip(TYPICAL_SEQUENCE, thick_row, top_row, bottom_row)
+            ]
+        }
+        for bh, total, thick_row, top_row, bottom_row in zip(
+            boreholes, total_depths, thickness_rows, top_rows, bottom_rows)
     ]
 
-    for bh in store.boreholes:
-        bh_id = str(bh.get('id', 'unknown'))
-        x = float(bh.get('x', 0))
-        y = float(bh.get('y', 0))
-        coal_thickness = float(bh.get('coalThickness', bh.get('thickness', 3)))
-
-        # 假设总深度是煤厚的10-15倍
-        total_depth = coal_thickness * (10 + np.random.random() * 5)
-
-        layers = []
-        current_depth = 0
-
-        for seq in typical_sequence:
-            if seq['is_coal']:
-                thickness = coal_thickness
-            else:
-                # 根据比例和一些随机变化计算厚度
-                base_thick = total_depth * seq['ratio']
-                thickness = base_thick * (0.8 + np.random.random() * 0.4)
-
-            layers.append({
-                'name': seq['name'],
-                'thickness': round(thickness, 2),
-                'top_depth': round(current_depth, 2),
-                'bottom_depth': round(current_depth + thickness, 2),
-                'is_coal': seq['is_coal']
-            })
-            current_depth += thickness
-
-        boreholes_data.append({
-            'id': bh_id,
-            'x': x,
-            'y': y,
-            'total_depth': round(current_depth, 2),
-            'layers': layers
-        })
-
-    return {
+    return json_response({
         'boreholes': boreholes_data,
         'count': len(boreholes_data),
-        'total_layers': sum(len(b['layers']) for b in boreholes_data),
+        'total_layers': len(boreholes_data) * len(TYPICAL_SEQUENCE),
         'is_mock': True
-    }
+    })
 
 
 @router.post("/")
@@ -201,16 +198,25 @@ async def generate_geology(resolution: int = 50):
     min_x, min_y = points.min(axis=0)
     max_x, max_y = points.max(axis=0)
     
-    grid_x, grid_y = np.mgrid[min_x:max_x:complex(0, resolution), min_y:max_y:complex(0, resolution)]
-    
-    # 插值 (使用 cubic 插值，如果点太少会退化为 linear)
+    # 网格点坐标直接由一维刻度展开（与 np.mgrid 的展开顺序一致），不生成二维网格数组
+    gx = np.linspace(min_x, max_x, resolution)
+    gy = np.linspace(min_y, max_y, resolution)
+    xi = np.empty((resolution * resolution, 2))
+    xi[:, 0] = np.repeat(gx, resolution)
+    xi[:, 1] = np.tile(gy, resolution)
+
+    # 插值 (使用 cubic 插值，失败时退化为 linear)，凸包外直接填 0
+    # 三角剖分只做一次，两种插值共用
+    tri = Delaunay(points)
     try:
-        grid_z = griddata(points, values, (grid_x, grid_y), method='cubic')
-    except:
-        grid_z = griddata(points, values, (grid_x, grid_y), method='linear')
-        
-    # 替换 NaN
-    grid_z = np.nan_to_num(grid_z)
+        grid_z = CloughTocher2DInterpolator(tri, values, fill_value=0.0)(xi)
+    except Exception:
+        grid_z = barycentric_interpolate(tri, values, xi, fill_value=0.0)
+
+    # 仅用于可视化，降为 float32：内存减半，orjson 输出的数字也更短
+    grid_z = grid_z.reshape(resolution, resolution).astype(np.float32)
+    # 输入含无效值时仍可能产生 NaN，原地替换
+    np.nan_to_num(grid_z, copy=False)
     
     # 保存结果
     store.geology_model = {
@@ -219,11 +225,11 @@ async def generate_geology(resolution: int = 50):
         "minY": float(min_y),
         "maxX": float(max_x),
         "maxY": float(max_y),
-        "data": grid_z.tolist()
+        "data": grid_z
     }
     
-    return {"success": True, "model": store.geology_model}
+    return json_response({"success": True, "model": store.geology_model})
 
 @router.get("/")
 async def get_geology():
-    return store.geology_model or {}
+    return json_response(store.geology_model or {})
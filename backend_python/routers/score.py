@@ -1,10 +1,24 @@
 from fastapi import APIRouter
+from utils.responses import json_response
 from store import store
-import pandas as pd
 import numpy as np
+from functools import lru_cache
 
 router = APIRouter()
 
+
+@lru_cache(maxsize=8)
+def _placeholder_grid(rows: int, cols: int) -> np.ndarray:
+    """
+    生成占位评分网格（50-99 的整数，uint8 存储）
+
+    固定随机种子，同一尺寸只生成一次；返回只读数组，供多次请求共享
+    """
+    grid = np.random.default_rng(seed=0).integers(50, 100, size=(rows, cols), dtype=np.uint8)
+    grid.setflags(write=False)
+    return grid
+
+
 @router.post("/")
 async def calculate_score():
     # 简单返回当前钻孔，实际应包含插值逻辑
@@ -20,17 +34,17 @@ async def calculate_score():
     if not normalized_boreholes:
         return {"boreholes": []}
         
-    # 生成简单的网格数据用于热力图
-    df = pd.DataFrame(normalized_boreholes)
-    min_x, max_x = df['x'].min(), df['x'].max()
-    min_y, max_y = df['y'].min(), df['y'].max()
+    # 生成简单的网格数据用于热力图（范围直接由归一化坐标数组计算）
+    xy = store.get_normalized_boreholes_xy()
+    min_x, min_y = xy.min(axis=0).tolist()
+    max_x, max_y = xy.max(axis=0).tolist()
     
     resolution = 50
     cols = int((max_x - min_x) / resolution) + 1
     rows = int((max_y - min_y) / resolution) + 1
     
-    # 模拟网格数据
-    grid_data = np.random.randint(50, 100, size=(rows, cols)).tolist()
+    # 模拟网格数据（按网格尺寸缓存，由 orjson 直接序列化）
+    grid_data = _placeholder_grid(rows, cols)
     
     grids = {
         "composite": {
@@ -46,12 +60,12 @@ async def calculate_score():
     store.scores = {"grids": grids}
     
     # 返回归一化后的钻孔和边界数据
-    return {
+    return json_response({
         "boreholes": normalized_boreholes,
         "boundary": normalized_boundary,
         "grids": grids,
         "contours": {} # 暂不生成等值线
-    }
+    })
 
 @router.get("/")
 async def get_score():
@@ -62,15 +76,15 @@ async def get_score():
     normalized_boreholes = store.get_normalized_boreholes()
     normalized_boundary = store.get_normalized_boundary()
     
-    return {
+    return json_response({
         "boreholes": normalized_boreholes,
         "boundary": normalized_boundary,
         "grids": store.scores.get("grids", {}),
         "contours": {}
-    }
+    })
 
 @router.get("/grid/{type}")
 async def get_score_grid(type: str):
     if not store.scores or "grids" not in store.scores:
         return {}
-    return store.scores["grids"].get(type, {})
+    return json_response(store.scores["grids"].get(type, {}))
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from utils.parsing import parse_csv_file, normalize_columns
+from utils.parsing import parse_csv_dataframe, normalize_dataframe
 from store import store
 
 router = APIRouter()
@@ -8,8 +8,9 @@ router = APIRouter()
 async def upload_boundary(file: UploadFile = File(...)):
     try:
         content = await file.read()
-        raw_data = parse_csv_file(content)
-        boundary = normalize_columns(raw_data, 'boundary')
+        # 直接按列解析与标准化，不经过逐行的字典列表
+        df = parse_csv_dataframe(content)
+        boundary = normalize_dataframe(df, 'boundary')
         
         if not boundary:
             raise HTTPException(status_code=400, detail="无法解析边界数据")
@@ -27,12 +28,12 @@ async def upload_boundary(file: UploadFile = File(...)):
 async def upload_coordinates(file: UploadFile = File(...)):
     try:
         content = await file.read()
-        raw_data = parse_csv_file(content)
-        coords = normalize_columns(raw_data, 'coordinate')
+        df = parse_csv_dataframe(content)
+        coords = normalize_dataframe(df, 'coordinate')
         
         if not coords:
             # 获取列名以便调试
-            columns = list(raw_data[0].keys()) if raw_data else "No data"
+            columns = list(df.columns) if len(df) else "No data"
             raise HTTPException(status_code=400, detail=f"无法解析坐标数据。检测到的列名: {columns}。请确保包含 id, x, y 相关列。")
             
         store.borehole_coordinates = coords
@@ -2,15 +2,70 @@
 数据存储模块 - 支持SQLite持久化
 """
 import json
+import math
 import sqlite3
 import os
+import threading
+import zlib
 from typing import List, Dict, Any, Optional
 from contextlib import contextmanager
 from datetime import datetime
 
+import numpy as np
+import orjson
+
+from utils.kernels import points_in_polygon
+
 # 数据库文件路径
 DB_PATH = os.getenv("MINING_DB_PATH", "mining_data.db")
 
+# 项目中以 JSON 存储的数据字段
+DATA_FIELDS = ('boundary', 'boreholes', 'borehole_coordinates', 'borehole_layer_data',
+               'geology_model', 'scores', 'design_result', 'coord_offset')
+LIST_FIELDS = frozenset({'boundary', 'boreholes', 'borehole_coordinates', 'borehole_layer_data'})
+
+# 字段序列化选项：numpy 数组/标量直接写出，无需事先 tolist()
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# 字段以 orjson 字节（BLOB）存储；超过阈值时 zlib 压缩并加前缀标记
+# （JSON 文本不会以该字节开头，可与未压缩数据区分）
+COMPRESS_THRESHOLD = 16 * 1024
+COMPRESSED_PREFIX = b'Z'
+
+
+def _replace_non_finite(value: Any) -> Any:
+    """
+    将值中的 NaN/Infinity 替换为 None
+
+    orjson 把非有限浮点数写成 null，写入前统一替换，使进程内缓存与重启后从库中读出的值一致
+    """
+    if isinstance(value, dict):
+        return {k: _replace_non_finite(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_replace_non_finite(v) for v in value]
+    if isinstance(value, (float, np.floating)):
+        return value if math.isfinite(value) else None
+    if isinstance(value, np.ndarray) and value.dtype.kind == 'f':
+        if not np.isfinite(value).all():
+            # 含非有限值的数组按写库时的序列化结果转为列表（null 读回为 None），与重启后读出的值完全一致
+            return orjson.loads(orjson.dumps(value, option=ORJSON_OPTIONS))
+    return value
+
+
+# 进程内共享的数据库连接（WAL 模式，自动提交），所有访问经锁串行化
+_conn: Optional[sqlite3.Connection] = None
+_conn_lock = threading.RLock()
+
+
+def _connect() -> sqlite3.Connection:
+    """创建数据库连接并设置 PRAGMA"""
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
 
 def init_database():
     """初始化数据库表"""
@@ -33,69 +88,172 @@ def init_database():
         """)
 
         # 确保有默认项目
-        cursor = conn.execute("SELECT id FROM projects WHERE name = 'default'")
-        if cursor.fetchone() is None:
-            conn.execute("INSERT INTO projects (name) VALUES ('default')")
+        _ensure_project(conn, 'default')
 
-        conn.commit()
+
+def _ensure_project(conn: sqlite3.Connection, name: str):
+    """项目不存在时创建（单条语句，name 列无唯一约束，不能用 INSERT OR IGNORE）"""
+    conn.execute(
+        "INSERT INTO projects (name) SELECT ? WHERE NOT EXISTS (SELECT 1 FROM projects WHERE name = ?)",
+        (name, name)
+    )
 
 
 @contextmanager
 def get_db_connection():
-    """获取数据库连接的上下文管理器"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-    finally:
-        conn.close()
+    """获取共享数据库连接的上下文管理器（首次使用时创建，持有锁期间独占）"""
+    global _conn
+    with _conn_lock:
+        if _conn is None:
+            _conn = _connect()
+        yield _conn
 
 
 class Store:
-    """数据存储类 - 支持SQLite持久化"""
+    """
+    数据存储类 - 支持SQLite持久化
+
+    字段值约定为只读：读取属性返回的是进程内缓存对象本身（不再每次解码新副本），
+    调用方不得原地修改（如 store.design_result["stats"][...] = ...）。
+    原地修改既不会写库，也不会递增字段版本号，依赖版本号的派生缓存
+    （坐标数组、归一化结果、DXF 导出、规程验证结果）会继续使用旧数据。
+    需要修改时先复制，再整体赋值给属性或调用 update() 写回。
+    """
 
     def __init__(self, project_name: str = 'default'):
         self.project_name = project_name
+        # 各字段的写入版本号（进程内），用于派生结果的缓存失效
+        self._versions: Dict[str, int] = {}
+        # 坐标数组缓存：字段名 -> (版本号, (N, 2) float64 数组)
+        self._xy_cache: Dict[str, tuple] = {}
+        # 归一化结果缓存：名称 -> (依赖字段版本号, 结果)
+        self._normalized_cache: Dict[str, tuple] = {}
+        # 已解码字段缓存：字段名 -> Python 对象（写入时同步更新）
+        # 读取返回的是缓存对象本身，按只读约定使用（见类说明）
+        self._cache: Dict[str, Any] = {}
         self._ensure_project_exists()
+        self._load_all()
 
     def _ensure_project_exists(self):
         """确保项目存在"""
         with get_db_connection() as conn:
-            cursor = conn.execute(
-                "SELECT id FROM projects WHERE name = ?",
+            _ensure_project(conn, self.project_name)
+
+    @staticmethod
+    def _encode(value: Any) -> bytes:
+        """编码字段值为 BLOB：orjson 序列化，较大时 zlib 压缩"""
+        data = orjson.dumps(value, option=ORJSON_OPTIONS)
+        if len(data) > COMPRESS_THRESHOLD:
+            return COMPRESSED_PREFIX + zlib.compress(data, 1)
+        return data
+
+    @staticmethod
+    def _decode(field: str, value: Any) -> Any:
+        """解码数据库中的字段值，空值返回默认的空列表/字典"""
+        if not value:
+            return [] if field in LIST_FIELDS else {}
+
+        if isinstance(value, bytes):
+            if value.startswith(COMPRESSED_PREFIX):
+                value = zlib.decompress(memoryview(value)[1:])
+            return orjson.loads(value)
+
+        # 旧版本写入的 TEXT（及默认值）
+        try:
+            return orjson.loads(value)
+        except orjson.JSONDecodeError:
+            # 兼容用标准库写入、含 NaN/Infinity 的数据（读出后同样替换为 None）
+            return _replace_non_finite(json.loads(value))
+
+    def _load_all(self):
+        """一次查询读取全部数据字段，填充尚未缓存的字段"""
+        with get_db_connection() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(DATA_FIELDS)} FROM projects WHERE name = ?",
                 (self.project_name,)
-            )
-            if cursor.fetchone() is None:
-                conn.execute(
-                    "INSERT INTO projects (name) VALUES (?)",
-                    (self.project_name,)
-                )
-                conn.commit()
+            ).fetchone()
+        if row:
+            for field in DATA_FIELDS:
+                if field not in self._cache:
+                    self._cache[field] = self._decode(field, row[field])
 
     def _get_field(self, field: str) -> Any:
-        """从数据库获取字段"""
+        """获取字段，优先读取进程内缓存，未命中时查询数据库"""
+        try:
+            return self._cache[field]
+        except KeyError:
+            pass
+
         with get_db_connection() as conn:
             cursor = conn.execute(
                 f"SELECT {field} FROM projects WHERE name = ?",
                 (self.project_name,)
             )
             row = cursor.fetchone()
-            if row:
-                value = row[0]
-                if value:
-                    return json.loads(value)
-        return [] if field in ('boundary', 'boreholes', 'borehole_coordinates', 'borehole_layer_data') else {}
+        value = self._decode(field, row[0] if row else None)
+        self._cache[field] = value
+        return value
 
     def _set_field(self, field: str, value: Any):
-        """设置数据库字段"""
+        """设置数据库字段，并同步更新缓存"""
+        self.update(**{field: value})
+
+    def update(self, **fields: Any):
+        """
+        批量写入多个字段：一条 UPDATE 语句、一次提交，并同步更新缓存
+
+        Example:
+            store.update(boreholes=merged, boundary=boundary)
+        """
+        if not fields:
+            return
+        unknown = fields.keys() - set(DATA_FIELDS)
+        if unknown:
+            raise ValueError(f"未知字段: {', '.join(sorted(unknown))}")
+
+        # NaN/Infinity 先替换为 None（与 orjson 写出的 null 一致）；序列化在加锁之前完成，不占用数据库连接
+        fields = {field: _replace_non_finite(value) for field, value in fields.items()}
+        params = [self._encode(value) for value in fields.values()]
+        assignments = ', '.join(f"{field} = ?" for field in fields)
         with get_db_connection() as conn:
             conn.execute(
-                f"UPDATE projects SET {field} = ?, updated_at = CURRENT_TIMESTAMP WHERE name = ?",
-                (json.dumps(value, ensure_ascii=False), self.project_name)
+                f"UPDATE projects SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE name = ?",
+                (*params, self.project_name)
             )
-            conn.commit()
+
+        for field, value in fields.items():
+            self._cache[field] = value
+            self._versions[field] = self._versions.get(field, 0) + 1
+
+    def field_version(self, field: str) -> int:
+        """获取字段的写入版本号，每次写入后递增"""
+        return self._versions.get(field, 0)
+
+    def _xy_array(self, field: str) -> np.ndarray:
+        """获取字段中各点坐标的 (N, 2) float64 只读数组，按字段版本缓存"""
+        version = self._versions.get(field, 0)
+        cached = self._xy_cache.get(field)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        rows = self._get_field(field)
+        xy = np.array([(r.get('x', 0), r.get('y', 0)) for r in rows], dtype=np.float64).reshape(-1, 2)
+        xy.setflags(write=False)
+        self._xy_cache[field] = (version, xy)
+        return xy
 
     # ============ 属性访问器 ============
+    # 数据字段属性返回缓存对象本身，只读；修改须复制后整体赋值写回
+
+    @property
+    def boundary_xy(self) -> np.ndarray:
+        """边界点坐标数组 (N, 2)，只读"""
+        return self._xy_array('boundary')
+
+    @property
+    def boreholes_xy(self) -> np.ndarray:
+        """钻孔坐标数组 (N, 2)，只读"""
+        return self._xy_array('boreholes')
 
     @property
     def boundary(self) -> List[Dict[str, float]]:
@@ -179,41 +337,88 @@ class Store:
                     updated_at = CURRENT_TIMESTAMP
                 WHERE name = ?
             """, (self.project_name,))
-            conn.commit()
+        # 所有字段均被重置，包括本进程尚未写入过的字段
+        self._cache.clear()
+        for field in DATA_FIELDS:
+            self._versions[field] = self._versions.get(field, 0) + 1
 
     def get_normalized_boundary(self) -> List[Dict[str, float]]:
-        """获取归一化后的边界"""
-        boundary = self.boundary
-        if not boundary:
+        """获取归一化后的边界（边界未变化时复用上次结果，每次返回新的列表与字典副本，调用方修改不影响缓存）"""
+        key = self._versions.get('boundary', 0)
+        cached = self._normalized_cache.get('boundary')
+        if cached is not None and cached[0] == key:
+            return [dict(item) for item in cached[1]]
+
+        xy = self.get_normalized_boundary_xy()
+        if len(xy) == 0:
             return []
 
-        min_x = min(p['x'] for p in boundary)
-        min_y = min(p['y'] for p in boundary)
+        if xy is self.boundary_xy:
+            result = self.boundary
+        else:
+            result = [{'x': x, 'y': y} for x, y in xy.tolist()]
+
+        self._normalized_cache['boundary'] = (key, result)
+        return [dict(item) for item in result]
+
+    def get_normalized_boundary_xy(self) -> np.ndarray:
+        """获取归一化后的边界坐标数组 (N, 2)，并在需要时更新坐标偏移量；无需偏移时即 boundary_xy"""
+        xy = self.boundary_xy
+        if len(xy) == 0:
+            return xy
+
+        min_x, min_y = xy.min(axis=0).tolist()
 
         if min_x > 100 or min_y > 100:
-            self.coord_offset = {'x': min_x, 'y': min_y}
-            return [{'x': p['x'] - min_x, 'y': p['y'] - min_y} for p in boundary]
+            offset = {'x': min_x, 'y': min_y}
+            # 偏移量未变化时不重复写库
+            if self.coord_offset != offset:
+                self.coord_offset = offset
+            return xy - (min_x, min_y)
 
-        return boundary.copy()
+        return xy
 
     def get_normalized_boreholes(self) -> List[Dict[str, Any]]:
-        """获取归一化后的钻孔数据"""
+        """获取归一化后的钻孔数据（钻孔与偏移量均未变化时复用上次结果，每次返回新的列表与字典副本，调用方修改不影响缓存）"""
+        key = (self._versions.get('boreholes', 0), self._versions.get('coord_offset', 0))
+        cached = self._normalized_cache.get('boreholes')
+        if cached is not None and cached[0] == key:
+            return [dict(item) for item in cached[1]]
+
         boreholes = self.boreholes
         if not boreholes:
             return []
 
+        xy = self.get_normalized_boreholes_xy()
+        if xy is not self.boreholes_xy:
+            result = [{**bh, 'x': x, 'y': y} for bh, (x, y) in zip(boreholes, xy.tolist())]
+        else:
+            result = boreholes
+
+        self._normalized_cache['boreholes'] = (key, result)
+        return [dict(item) for item in result]
+
+    def get_normalized_boreholes_xy(self) -> np.ndarray:
+        """获取归一化后的钻孔坐标数组 (N, 2)，无偏移时即 boreholes_xy"""
         offset = self.coord_offset
         offset_x = offset.get('x', 0)
         offset_y = offset.get('y', 0)
 
         if offset_x > 0 or offset_y > 0:
-            return [{
-                **bh,
-                'x': bh.get('x', 0) - offset_x,
-                'y': bh.get('y', 0) - offset_y
-            } for bh in boreholes]
+            return self.boreholes_xy - (offset_x, offset_y)
+        return self.boreholes_xy
+
+    def points_in_boundary(self, points: np.ndarray) -> np.ndarray:
+        """
+        判断各点是否位于采区边界内
+
+        Args:
+            points: (N, 2) 点坐标，与 boundary 同一（未归一化）坐标系
 
-        return boreholes.copy()
+        Returns:
+            (N,) bool 数组；未上传边界时全部为 False
+        """
+        return points_in_polygon(points, self.boundary_xy)
 
     def get_project_info(self) -> Dict[str, Any]:
         """获取项目信息"""
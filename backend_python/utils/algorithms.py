@@ -10,14 +10,15 @@
 """
 
 import numpy as np
-from shapely.geometry import Polygon, Point, LineString, box, MultiPolygon
-from shapely.affinity import rotate, translate
-from shapely.ops import unary_union
+import shapely
+from shapely.geometry import Polygon, Point
+from shapely.affinity import affine_transform
 from typing import List, Dict, Any, Tuple, Optional
 from dataclasses import dataclass
 
 from utils.mining_rules import MiningRules, DEFAULT_MINING_RULES
 from utils.geology_analysis import GeologyAnalyzer
+from utils.kernels import best_face_length
 from utils.logger import logger, log_design_operation
 
 
@@ -40,12 +41,68 @@ def create_polygon_from_points(points: List[Dict[str, float]]) -> Polygon:
     if not points or len(points) < 3:
         return Polygon()
 
-    coords = [(p['x'], p['y']) for p in points]
-    if coords[0] != coords[-1]:
-        coords.append(coords[0])
+    # 坐标直接展开为连续数组，Polygon 构造时会自动闭合首尾
+    coords = np.fromiter(
+        (v for p in points for v in (p['x'], p['y'])), dtype=np.float64, count=2 * len(points)
+    ).reshape(-1, 2)
     return Polygon(coords)
 
 
+def _largest_polygon(geom) -> Polygon:
+    """取几何对象中面积最大的多边形部分（make_valid 可能返回 MultiPolygon 或 GeometryCollection）"""
+    if geom.geom_type == 'Polygon':
+        return geom
+    polygons = [g for g in shapely.get_parts(shapely.get_parts(geom)) if g.geom_type == 'Polygon']
+    return max(polygons, key=lambda g: g.area) if polygons else Polygon()
+
+
+def rotation_matrices(angle: float, origin: Tuple[float, float]) -> Tuple[Tuple[float, ...], Tuple[float, ...]]:
+    """
+    绕 origin 旋转 angle 度（逆时针为正）的正向与逆向仿射矩阵
+
+    返回 shapely.affinity.affine_transform 使用的 (a, b, d, e, xoff, yoff) 六元组，
+    计算方式与 shapely.affinity.rotate(angle) / rotate(-angle) 完全一致；
+    三角函数只计算一次，逆矩阵由正弦取反得到
+    """
+    rad = angle * np.pi / 180.0
+    cosp = np.cos(rad)
+    sinp = np.sin(rad)
+    if abs(cosp) < 2.5e-16:
+        cosp = 0.0
+    if abs(sinp) < 2.5e-16:
+        sinp = 0.0
+
+    x0, y0 = origin
+    forward = (cosp, -sinp, sinp, cosp,
+               x0 - x0 * cosp + y0 * sinp, y0 - x0 * sinp - y0 * cosp)
+    inverse = (cosp, sinp, -sinp, cosp,
+               x0 - x0 * cosp - y0 * sinp, y0 + x0 * sinp - y0 * cosp)
+    return forward, inverse
+
+
+def rotation_matrix(angle: float, origin: Tuple[float, float]) -> Tuple[float, ...]:
+    """绕 origin 旋转 angle 度（逆时针为正）的仿射矩阵，见 rotation_matrices"""
+    return rotation_matrices(angle, origin)[0]
+
+
+def transform_points(xy: np.ndarray, matrix: Tuple[float, ...]) -> np.ndarray:
+    """对 (N, 2) 坐标数组批量应用 rotation_matrix 返回的仿射矩阵"""
+    a, b, d, e, xoff, yoff = matrix
+    x = xy[:, 0]
+    y = xy[:, 1]
+    return np.column_stack([a * x + b * y + xoff, d * x + e * y + yoff])
+
+
+def rotate_points(xy: np.ndarray, angle: float, origin: Tuple[float, float]) -> np.ndarray:
+    """
+    批量旋转点坐标（角度制，逆时针为正）
+
+    计算方式与 shapely.affinity.rotate 完全一致（结果逐位相同），
+    但一次处理 (N, 2) 数组，避免逐点构造 Point 几何对象
+    """
+    return transform_points(xy, rotation_matrix(angle, origin))
+
+
 def generate_smart_layout(
         boundary_points: List[Dict[str, float]],
         dip_angle: float,
@@ -85,7 +142,7 @@ def generate_smart_layout(
 
     if not boundary_poly.is_valid:
         logger.warning("Invalid boundary polygon, attempting to fix...")
-        boundary_poly = boundary_poly.buffer(0)
+        boundary_poly = _largest_polygon(shapely.make_valid(boundary_poly))
 
     total_area = boundary_poly.area
     log_design_operation("开始布局", {"采区面积": f"{total_area:.0f}m²", "推进长度": face_width, "煤柱宽度": pillar_width})
@@ -151,8 +208,10 @@ def generate_smart_layout(
     logger.debug(layout_info)
 
     # 4. 旋转采区到水平坐标系进行切割
+    # 正/逆旋转矩阵每次布局只计算一次，后续几何与坐标旋转均复用
     centroid = mining_area.centroid
-    rotated_area = rotate(mining_area, rotation_angle, origin=centroid)
+    to_rotated, to_original = rotation_matrices(rotation_angle, (centroid.x, centroid.y))
+    rotated_area = affine_transform(mining_area, to_rotated)
     min_x, min_y, max_x, max_y = rotated_area.bounds
 
     # 采区尺寸
@@ -175,8 +234,9 @@ def generate_smart_layout(
     logger.debug(f"设计参数: 工作面长度={face_length:.0f}m, 推进长度={advance_length:.0f}m, 区段煤柱={section_pillar:.0f}m")
 
     # 6. 生成工作面
-    workfaces = []
-    face_id = 1
+    # 条带循环只确定各条带的y范围，求交及面积/包围盒/形心等几何量在循环结束后批量计算
+    min_strip_length = mining_rules.face_length_min * 0.8   # 条带长度下限，更短的条带直接跳过
+    strip_bounds = []
 
     # 沿工作面方向（y方向）划分
     # 每个"条带"就是一个工作面
@@ -186,107 +246,39 @@ def generate_smart_layout(
         # 确定这一条工作面的y范围
         strip_min_y = current_y
         strip_max_y = min(current_y + face_length, max_y)
+        current_y = strip_max_y + section_pillar
 
         # 实际的工作面长度
         actual_length = strip_max_y - strip_min_y
 
-        # 检查长度是否符合规程
-        is_length_valid, length_msg = mining_rules.validate_face_length(actual_length)
-
-        if actual_length < mining_rules.face_length_min * 0.8:
-            # 长度太短，跳过或合并到上一个
-            logger.debug(f"条带 {face_id} 长度 {actual_length:.0f}m 过短，跳过")
-            current_y = strip_max_y + section_pillar
+        if actual_length < min_strip_length:
+            # 长度太短，跳过或合并到上一个（日志参数延迟格式化，未开启 DEBUG 时不产生字符串）
+            logger.debug("条带 %d 长度 %.0fm 过短，跳过", len(strip_bounds) + 1, actual_length)
             continue
 
-        # 创建这一条的候选矩形
-        strip_rect = box(min_x, strip_min_y, max_x, strip_max_y)
-
-        # 与可采区求交
-        intersection = rotated_area.intersection(strip_rect)
+        strip_bounds.append((strip_min_y, strip_max_y))
 
-        if intersection.is_empty:
-            current_y = strip_max_y + section_pillar
-            continue
+    # 所有条带矩形一次构造，与可采区一次批量求交
+    candidate_parts = []
+    if strip_bounds:
+        strip_min_ys, strip_max_ys = np.array(strip_bounds).T
+        shapely.prepare(rotated_area)
+        intersections = shapely.intersection(rotated_area, shapely.box(min_x, strip_min_ys, max_x, strip_max_ys))
 
-        # 处理可能的多个部分，安全处理各种几何类型
-        parts = []
-        if intersection.geom_type == 'Polygon':
-            parts = [intersection]
-        elif intersection.geom_type in ('MultiPolygon', 'GeometryCollection'):
-            parts = [g for g in intersection.geoms if g.geom_type == 'Polygon']
-        # 其他类型（LineString, Point等）跳过
-
-        for part in parts:
-            if part.area < 500:
+        for intersection in intersections:
+            if intersection.is_empty:
                 continue
 
-            # 获取这部分的边界
-            part_min_x, part_min_y, part_max_x, part_max_y = part.bounds
-            part_width = part_max_x - part_min_x
-            part_length = part_max_y - part_min_y
-
-            # 验证尺寸
-            is_valid = True
-            validation_msgs = []
-
-            # 检查工作面长度
-            length_valid, length_msg = mining_rules.validate_face_length(part_length)
-            if not length_valid:
-                validation_msgs.append(length_msg)
-                # 长度不符合但仍可接受（边缘工作面）
-                if part_length < mining_rules.face_length_min * 0.6:
-                    is_valid = False
-
-            # 检查推进长度
-            # 推进长度是整个工作面的水平推进距离
-            advance_valid, advance_msg = mining_rules.validate_advance_length(part_width)
-            if not advance_valid:
-                validation_msgs.append(advance_msg)
-
-            # 旋转回原始坐标系
-            original_shape = rotate(part, -rotation_angle, origin=centroid)
-            bounds = original_shape.minimum_rotated_rectangle
-            coords = list(bounds.exterior.coords)
-            center = original_shape.centroid
-
-            # 计算评分
-            if geology_analyzer:
-                score_data = geology_analyzer.calculate_score_at_point(
-                    center.x, center.y, target_seam
-                )
-                avg_score = score_data['total_score']
-            else:
-                # 没有地质数据时，基于位置给一个基础分
-                avg_score = 75 + (10 * (1 - face_id / 10))  # 靠前的工作面分数略高
-
-            # 计算旋转坐标系中的中心点（用于巷道生成）
-            part_center = part.centroid
-
-            workface = {
-                "id": f"WF-{face_id:02d}",
-                "x": coords[0][0],
-                "y": coords[0][1],
-                "center_x": center.x,           # 原始坐标系中的中心点
-                "center_y": center.y,
-                "rotated_center_x": part_center.x,  # 旋转坐标系中的中心点（用于巷道生成）
-                "rotated_center_y": part_center.y,
-                "width": part_width,      # 推进长度（旋转坐标系中的x方向尺寸）
-                "length": part_length,    # 工作面长度（旋转坐标系中的y方向尺寸）
-                "area": part.area,
-                "points": [{"x": x, "y": y} for x, y in coords[:-1]],
-                "avgScore": round(avg_score, 1),
-                "isValid": is_valid,
-                "validationMsg": "; ".join(validation_msgs) if validation_msgs else "符合规程",
-                "faceLength": round(part_length, 1),
-                "advanceLength": round(part_width, 1)
-            }
-
-            workfaces.append(workface)
-            face_id += 1
+            # 处理可能的多个部分，安全处理各种几何类型
+            if intersection.geom_type == 'Polygon':
+                candidate_parts.append(intersection)
+            elif intersection.geom_type in ('MultiPolygon', 'GeometryCollection'):
+                candidate_parts.extend(g for g in intersection.geoms if g.geom_type == 'Polygon')
+            # 其他类型（LineString, Point等）跳过
 
-        # 移动到下一条（加上煤柱宽度）
-        current_y = strip_max_y + section_pillar
+    workfaces, columns = _build_strip_workfaces(
+        candidate_parts, to_original, mining_rules, geology_analyzer, target_seam
+    )
 
     # 如果工作面数量太少，尝试调整参数
     if len(workfaces) == 0:
@@ -303,19 +295,18 @@ def generate_smart_layout(
         mining_rules
     )
 
-    # 8. 统计信息
-    valid_count = sum(1 for wf in workfaces if wf.get('isValid', True))
-    total_workface_area = sum(wf['area'] for wf in workfaces)
+    # 8. 统计信息（直接基于按列数组计算，无需逐个读取工作面字典）
+    valid_count = int(np.count_nonzero(columns["valid"]))
 
     stats = {
-        "totalArea": total_workface_area,
+        "totalArea": float(columns["area"].sum()),
         "count": len(workfaces),
         "validCount": valid_count,
         "invalidCount": len(workfaces) - valid_count,
         "layoutDirection": layout_info,
-        "avgFaceLength": round(np.mean([wf['length'] for wf in workfaces]), 1) if workfaces else 0,
-        "avgAdvanceLength": round(np.mean([wf['width'] for wf in workfaces]), 1) if workfaces else 0,
-        "avgScore": round(np.mean([wf['avgScore'] for wf in workfaces]), 1) if workfaces else 0,
+        "avgFaceLength": round(columns["length"].mean(), 1),
+        "avgAdvanceLength": round(columns["width"].mean(), 1),
+        "avgScore": round(columns["score"].mean(), 1),
         "miningMethod": f"{'走向' if mining_rules.layout_direction == 'strike' else '倾向'}长壁后退式开采"
     }
 
@@ -328,32 +319,132 @@ def generate_smart_layout(
     }
 
 
+def _outline_corners(parts: np.ndarray, to_original: Tuple[float, ...]) -> np.ndarray:
+    """
+    批量计算工作面轮廓：part 旋转回原始坐标系后的最小外接矩形四角 (N, 4, 2)
+
+    不规则（非矩形）的 part 轮廓及首个顶点均与逐个 rotate + minimum_rotated_rectangle 一致
+    """
+    original_parts = shapely.transform(parts, lambda xy: transform_points(xy, to_original))
+    rects = shapely.minimum_rotated_rectangle(original_parts)
+    return shapely.get_coordinates(shapely.get_exterior_ring(rects)).reshape(len(parts), 5, 2)[:, :4]
+
+
+def _build_strip_workfaces(
+        parts: List[Polygon],
+        to_original: Tuple[float, ...],
+        mining_rules: MiningRules,
+        geology_analyzer: Optional[GeologyAnalyzer],
+        target_seam: Optional[str]
+) -> Tuple[List[Dict[str, Any]], Dict[str, np.ndarray]]:
+    """
+    由条带裁剪得到的多边形批量生成工作面
+
+    面积、包围盒、形心、外接矩形均通过 shapely 2.0 向量化函数一次算出；尺寸校验与评分按列计算
+
+    Returns:
+        (workfaces, columns)：接口返回用的工作面字典列表，以及统计用的按列数组
+        （width / length / area / score / valid）
+    """
+    if parts:
+        parts = np.asarray(parts, dtype=object)
+        areas = shapely.area(parts)
+        keep = areas >= 500
+        parts, areas = parts[keep], areas[keep]
+    count = len(parts)
+    if not count:
+        return [], {}
+
+    part_min_x, part_min_y, part_max_x, part_max_y = shapely.bounds(parts).T
+    part_centers = shapely.get_coordinates(shapely.centroid(parts))
+    center_xy = transform_points(part_centers, to_original)
+    corners = _outline_corners(parts, to_original)
+
+    widths = part_max_x - part_min_x     # 推进长度（旋转坐标系中的x方向尺寸）
+    lengths = part_max_y - part_min_y    # 工作面长度（旋转坐标系中的y方向尺寸）
+
+    # 检查工作面长度：超出范围时提示，短于边缘工作面下限（0.6 倍最小长度）时判为无效
+    length_bad = (lengths < mining_rules.face_length_min) | (lengths > mining_rules.face_length_max)
+    valid = ~(length_bad & (lengths < mining_rules.face_length_min * 0.6))
+    # 检查推进长度：推进长度是整个工作面的水平推进距离
+    advance_bad = (widths < mining_rules.advance_length_min) | (widths > mining_rules.advance_length_max)
+
+    # 计算评分
+    face_ids = range(1, count + 1)
+    centers = center_xy.tolist()
+    if geology_analyzer:
+        # 所有工作面中心一次批量插值评分
+        scores = geology_analyzer.calculate_scores_at_points(
+            center_xy[:, 0], center_xy[:, 1], target_seam
+        )['total_score'].tolist()
+    else:
+        # 没有地质数据时，基于位置给一个基础分（靠前的工作面分数略高）
+        scores = [round(75 + (10 * (1 - face_id / 10)), 1) for face_id in face_ids]
+
+    width_list, length_list = widths.tolist(), lengths.tolist()
+    rotated_centers = part_centers.tolist()
+    corner_lists = corners.tolist()
+    valid_list = valid.tolist()
+
+    # 只有不符合规程的工作面才由规程生成提示信息
+    messages = []
+    for width, length, bad_length, bad_advance in zip(width_list, length_list, length_bad.tolist(), advance_bad.tolist()):
+        msgs = []
+        if bad_length:
+            msgs.append(mining_rules.validate_face_length(length)[1])
+        if bad_advance:
+            msgs.append(mining_rules.validate_advance_length(width)[1])
+        messages.append("; ".join(msgs) if msgs else "符合规程")
+
+    workfaces = [
+        {
+            "id": f"WF-{face_id:02d}",
+            "x": coords[0][0],
+            "y": coords[0][1],
+            "center_x": center[0],          # 原始坐标系中的中心点
+            "center_y": center[1],
+            "rotated_center_x": rotated[0],  # 旋转坐标系中的中心点（用于巷道生成）
+            "rotated_center_y": rotated[1],
+            "width": width,
+            "length": length,
+            "area": area,
+            "points": [{"x": x, "y": y} for x, y in coords],
+            "avgScore": score,
+            "isValid": is_valid,
+            "validationMsg": message,
+            "faceLength": round(length, 1),
+            "advanceLength": round(width, 1)
+        }
+        for face_id, coords, center, rotated, width, length, area, score, is_valid, message in zip(
+            face_ids, corner_lists, centers, rotated_centers, width_list, length_list,
+            areas.tolist(), scores, valid_list, messages)
+    ]
+
+    columns = {
+        "width": widths,
+        "length": lengths,
+        "area": areas,
+        "score": np.array(scores),
+        "valid": valid,
+    }
+    return workfaces, columns
+
+
 def _auto_detect_direction(mining_area: Polygon, mining_rules: MiningRules) -> Tuple[float, str]:
     """
     自动检测最佳布局方向
 
     基于最小外接矩形，选择使工作面数量最优的方向
     """
-    min_rect = mining_area.minimum_rotated_rectangle
-    rect_coords = list(min_rect.exterior.coords)
-
-    # 计算各边的长度和角度
-    edges = []
-    for i in range(len(rect_coords) - 1):
-        p1 = rect_coords[i]
-        p2 = rect_coords[i + 1]
-        dx = p2[0] - p1[0]
-        dy = p2[1] - p1[1]
-        length = np.sqrt(dx ** 2 + dy ** 2)
-        angle = np.degrees(np.arctan2(dy, dx))
-        edges.append((length, angle))
-
-    # 按长度排序
-    edges.sort(key=lambda x: x[0], reverse=True)
-
-    # 最长边作为推进方向（工作面沿短边布置）
-    long_edge_angle = edges[0][1]
-    short_edge_angle = edges[1][1] if len(edges) > 1 else long_edge_angle + 90
+    rect_coords = np.asarray(mining_area.minimum_rotated_rectangle.exterior.coords)
+
+    # 一次性计算各边的长度和角度
+    edge_vectors = np.diff(rect_coords, axis=0)
+    edge_lengths = np.hypot(edge_vectors[:, 0], edge_vectors[:, 1])
+
+    # 最长边作为推进方向（工作面沿短边布置）；长度相同时取靠前的边
+    dx, dy = edge_vectors[np.argmax(edge_lengths)]
+    long_edge_angle = np.degrees(np.arctan2(dy, dx))
 
     # 工作面应沿短边方向布置，这样工作面长度在合理范围内
     # 推进方向沿长边
@@ -378,25 +469,9 @@ def _determine_face_length(available_length: float, mining_rules: MiningRules) -
     if available_length <= max_len:
         return min(available_length, max_len)
 
-    # 尝试不同的工作面长度，找到最优解
-    best_length = preferred
-    best_waste = float('inf')
-
-    for test_length in range(int(min_len), int(max_len) + 1, 10):
-        # 计算可以放置的工作面数量
-        num_faces = int((available_length + pillar) / (test_length + pillar))
-        if num_faces < 1:
-            continue
-
-        # 计算总占用
-        total_used = num_faces * test_length + (num_faces - 1) * pillar
-        waste = available_length - total_used
-
-        if 0 <= waste < best_waste:
-            best_waste = waste
-            best_length = test_length
-
-    return best_length
+    # 尝试不同的工作面长度，找到最优解（纯数值循环，安装 numba 时编译执行）
+    return best_face_length(float(available_length), float(min_len), float(max_len),
+                            float(preferred), float(pillar))
 
 
 def _generate_fallback_layout(
@@ -430,18 +505,21 @@ def _generate_fallback_layout(
         return {"workfaces": [], "roadways": [], "stats": {"error": "区域高度为零", "miningMethod": "后备方案"}}
 
     workfaces = []
+    face_ids = []
+    parts = []
+    to_original = rotation_matrix(-rotation_angle, (centroid.x, centroid.y))
 
     # 简单地将整个区域作为一个或几个工作面
     num_faces = max(1, int(area_height / 200))
     face_height = area_height / num_faces
 
-    for i in range(num_faces):
-        strip_min_y = min_y + i * face_height
-        strip_max_y = min_y + (i + 1) * face_height
-
-        strip_rect = box(min_x, strip_min_y, max_x, strip_max_y)
-        intersection = rotated_area.intersection(strip_rect)
+    # 所有条带矩形一次构造，与可采区一次批量求交
+    strip_index = np.arange(num_faces)
+    strip_rects = shapely.box(min_x, min_y + strip_index * face_height, max_x, min_y + (strip_index + 1) * face_height)
+    shapely.prepare(rotated_area)
+    intersections = shapely.intersection(rotated_area, strip_rects)
 
+    for i, intersection in enumerate(intersections):
         if intersection.is_empty or intersection.area < 100:
             continue
 
@@ -456,30 +534,37 @@ def _generate_fallback_layout(
         elif intersection.geom_type != 'Polygon':
             continue
 
-        original_shape = rotate(intersection, -rotation_angle, origin=centroid)
-        bounds = original_shape.minimum_rotated_rectangle
-        coords = list(bounds.exterior.coords)
-        center = original_shape.centroid
+        face_ids.append(i + 1)
+        parts.append(intersection)
 
-        # 保存旋转坐标系中的中心点（用于巷道生成）
-        intersection_center = intersection.centroid
+    if parts:
+        # 外接矩形与中心点批量旋转回原始坐标系；旋转坐标系中的中心点用于巷道生成
+        parts = np.asarray(parts, dtype=object)
+        rotated_centers = shapely.get_coordinates(shapely.centroid(parts))
+        centers = transform_points(rotated_centers, to_original).tolist()
+        corner_lists = _outline_corners(parts, to_original).tolist()
+        areas = shapely.area(parts).tolist()
 
-        workfaces.append({
-            "id": f"WF-{i + 1:02d}",
-            "x": coords[0][0],
-            "y": coords[0][1],
-            "center_x": center.x,
-            "center_y": center.y,
-            "rotated_center_x": intersection_center.x,  # 旋转坐标系中的中心点
-            "rotated_center_y": intersection_center.y,
-            "width": area_width,
-            "length": face_height,
-            "area": intersection.area,
-            "points": [{"x": x, "y": y} for x, y in coords[:-1]],
-            "avgScore": 70,
-            "isValid": False,
-            "validationMsg": "后备方案生成，可能不符合规程"
-        })
+        workfaces = [
+            {
+                "id": f"WF-{face_id:02d}",
+                "x": coords[0][0],
+                "y": coords[0][1],
+                "center_x": center[0],
+                "center_y": center[1],
+                "rotated_center_x": rotated[0],  # 旋转坐标系中的中心点
+                "rotated_center_y": rotated[1],
+                "width": area_width,
+                "length": face_height,
+                "area": area,
+                "points": [{"x": x, "y": y} for x, y in coords],
+                "avgScore": 70,
+                "isValid": False,
+                "validationMsg": "后备方案生成，可能不符合规程"
+            }
+            for face_id, coords, center, rotated, area in zip(
+                face_ids, corner_lists, centers, rotated_centers.tolist(), areas)
+        ]
 
     roadways = generate_roadways_v2(
         workfaces, boundary_points, rotation_angle, centroid, rotated_area, mining_rules
@@ -541,47 +626,27 @@ def generate_roadways_v2(
         centroid = Point(avg_x, avg_y)
 
     roadways = []
+    to_rotated, to_original = rotation_matrices(rotation_angle, (centroid.x, centroid.y))
 
+    # 旋转坐标系中的工作面中心与尺寸，按工作面顺序存为列数组
     # 直接使用工作面在旋转坐标系中的位置（已经在 generate_smart_layout 中计算好）
-    rotated_centers = []
-    for wf in workfaces:
-        # 优先使用预计算的旋转坐标系中心点
-        if 'rotated_center_x' in wf and 'rotated_center_y' in wf:
-            rotated_centers.append({
-                'x': wf['rotated_center_x'],
-                'y': wf['rotated_center_y'],
-                'id': wf['id'],
-                'width': wf.get('width', 200),    # 推进距离（x方向）
-                'length': wf.get('length', 200)   # 工作面长度（y方向）
-            })
-        else:
-            # 向后兼容：如果没有预计算的旋转坐标，则重新计算
-            p = Point(wf['center_x'], wf['center_y'])
-            rp = rotate(p, rotation_angle, origin=centroid)
-            rotated_centers.append({
-                'x': rp.x,
-                'y': rp.y,
-                'id': wf['id'],
-                'width': wf.get('width', 200),
-                'length': wf.get('length', 200)
-            })
-
-    if not rotated_centers:
-        return []
+    # width是推进距离（x方向），length是工作面长度（y方向）
+    n = len(workfaces)
+    wf_x = np.fromiter((wf.get('rotated_center_x', np.nan) for wf in workfaces), dtype=np.float64, count=n)
+    wf_y = np.fromiter((wf.get('rotated_center_y', np.nan) for wf in workfaces), dtype=np.float64, count=n)
+    wf_half_len = np.fromiter((wf.get('length', 200) for wf in workfaces), dtype=np.float64, count=n) / 2
+    wf_half_width = np.fromiter((wf.get('width', 200) for wf in workfaces), dtype=np.float64, count=n) / 2
+
+    # 向后兼容：没有预计算旋转坐标的工作面，批量重新计算
+    missing = np.flatnonzero(np.isnan(wf_x) | np.isnan(wf_y))
+    if len(missing):
+        centers = np.array([(workfaces[i]['center_x'], workfaces[i]['center_y']) for i in missing], dtype=np.float64)
+        wf_x[missing], wf_y[missing] = transform_points(centers, to_rotated).T
 
     # 工作面群的边界
-    # width是推进距离（x方向），length是工作面长度（y方向）
-    wf_min_x = min(p['x'] - p['width'] / 2 for p in rotated_centers)
-    wf_max_x = max(p['x'] + p['width'] / 2 for p in rotated_centers)
-    wf_min_y = min(p['y'] - p['length'] / 2 for p in rotated_centers)
-    wf_max_y = max(p['y'] + p['length'] / 2 for p in rotated_centers)
-
-    # 采区边界
-    if rotated_area:
-        area_bounds = rotated_area.bounds
-        area_min_x = area_bounds[0]
-    else:
-        area_min_x = wf_min_x - 100
+    wf_min_x = float((wf_x - wf_half_width).min())
+    wf_min_y = float((wf_y - wf_half_len).min())
+    wf_max_y = float((wf_y + wf_half_len).max())
 
     # 大巷间距（运输大巷和回风大巷之间的距离）
     main_road_spacing = 15  # 两条大巷之间的间距
@@ -596,109 +661,104 @@ def generate_roadways_v2(
     main_road_y_start = wf_min_y - 50
     main_road_y_end = wf_max_y + 50
 
-    # 1. 运输大巷（垂直方向，在左侧靠近工作面）
-    transport_start = Point(transport_main_x, main_road_y_start)
-    transport_end = Point(transport_main_x, main_road_y_end)
-    real_ts = rotate(transport_start, -rotation_angle, origin=centroid)
-    real_te = rotate(transport_end, -rotation_angle, origin=centroid)
+    # 旋转坐标系中的全部巷道端点，最后一次性旋转回真实坐标系
+    # 每个工作面 4 个端点：运输顺槽起/止点、回风顺槽起/止点（开切眼连接两条顺槽的止点）
+    # 工作面的右边界（推进终点）
+    wf_right_x = wf_x + wf_half_width
+    # 运输顺槽在工作面上边界，回风顺槽在工作面下边界
+    transport_lane_y = wf_y + wf_half_len
+    return_lane_y = wf_y - wf_half_len
+
+    lane_points = np.empty((n, 4, 2))
+    lane_points[:, 0, 0] = transport_main_x
+    lane_points[:, 0, 1] = transport_lane_y
+    lane_points[:, 1, 0] = wf_right_x
+    lane_points[:, 1, 1] = transport_lane_y
+    lane_points[:, 2, 0] = transport_main_x
+    lane_points[:, 2, 1] = return_lane_y
+    lane_points[:, 3, 0] = wf_right_x
+    lane_points[:, 3, 1] = return_lane_y
+
+    main_points = np.array([
+        [transport_main_x, main_road_y_start],
+        [transport_main_x, main_road_y_end],
+        [ventilation_main_x, main_road_y_start],
+        [ventilation_main_x, main_road_y_end],
+    ])
+
+    real = transform_points(np.vstack([main_points, lane_points.reshape(-1, 2)]), to_original).tolist()
+    real_ts, real_te, real_vs, real_ve = real[:4]
+    main_road_length = abs(main_road_y_end - main_road_y_start)
 
+    # 1. 运输大巷（垂直方向，在左侧靠近工作面）
     roadways.append({
         "id": "Main-Transport",
         "name": "运输大巷",
         "type": "main",
         "path": [
-            {"x": real_ts.x, "y": real_ts.y},
-            {"x": real_te.x, "y": real_te.y}
+            {"x": real_ts[0], "y": real_ts[1]},
+            {"x": real_te[0], "y": real_te[1]}
         ],
-        "length": transport_start.distance(transport_end)
+        "length": main_road_length
     })
 
     # 2. 回风大巷（垂直方向，在左侧更远处）
-    vent_start = Point(ventilation_main_x, main_road_y_start)
-    vent_end = Point(ventilation_main_x, main_road_y_end)
-    real_vs = rotate(vent_start, -rotation_angle, origin=centroid)
-    real_ve = rotate(vent_end, -rotation_angle, origin=centroid)
-
     roadways.append({
         "id": "Main-Ventilation",
         "name": "回风大巷",
         "type": "ventilation",
         "path": [
-            {"x": real_vs.x, "y": real_vs.y},
-            {"x": real_ve.x, "y": real_ve.y}
+            {"x": real_vs[0], "y": real_vs[1]},
+            {"x": real_ve[0], "y": real_ve[1]}
         ],
-        "length": vent_start.distance(vent_end)
+        "length": main_road_length
     })
 
-    # 3. 为每个工作面生成顺槽（水平方向，在工作面上下两侧）
-    for i, wf in enumerate(rotated_centers):
+    # 3. 为每个工作面生成顺槽（水平方向，在工作面上下两侧），从运输大巷延伸到工作面右边界
+    lane_lengths = np.abs(wf_right_x - transport_main_x).tolist()
+    cut_lengths = np.abs(transport_lane_y - return_lane_y).tolist()
+
+    for i, wf in enumerate(workfaces):
         wf_id = wf['id']
-        wf_x = wf['x']
-        wf_y = wf['y']
-        wf_half_len = wf['length'] / 2
-        wf_half_width = wf['width'] / 2
-
-        # 工作面的左边界（靠近大巷）和右边界
-        wf_left_x = wf_x - wf_half_width
-        wf_right_x = wf_x + wf_half_width
-
-        # 运输顺槽：在工作面上方，从运输大巷水平延伸到工作面右边界
-        # 位置：工作面上边界
-        transport_lane_y = wf_y + wf_half_len
-        transport_lane_start = Point(transport_main_x, transport_lane_y)
-        transport_lane_end = Point(wf_right_x, transport_lane_y)
-        real_tls = rotate(transport_lane_start, -rotation_angle, origin=centroid)
-        real_tle = rotate(transport_lane_end, -rotation_angle, origin=centroid)
+        real_tls, real_tle, real_rls, real_rle = real[4 + 4 * i: 8 + 4 * i]
 
+        # 运输顺槽：在工作面上方
         roadways.append({
             "id": f"Transport-Lane-{i + 1}",
             "name": f"{wf_id}运输顺槽",
             "type": "transport",
             "workface": wf_id,
             "path": [
-                {"x": real_tls.x, "y": real_tls.y},
-                {"x": real_tle.x, "y": real_tle.y}
+                {"x": real_tls[0], "y": real_tls[1]},
+                {"x": real_tle[0], "y": real_tle[1]}
             ],
-            "length": transport_lane_start.distance(transport_lane_end)
+            "length": lane_lengths[i]
         })
 
-        # 回风顺槽：在工作面下方，从运输大巷水平延伸到工作面右边界
-        # 位置：工作面下边界
-        return_lane_y = wf_y - wf_half_len
-        return_lane_start = Point(transport_main_x, return_lane_y)
-        return_lane_end = Point(wf_right_x, return_lane_y)
-        real_rls = rotate(return_lane_start, -rotation_angle, origin=centroid)
-        real_rle = rotate(return_lane_end, -rotation_angle, origin=centroid)
-
+        # 回风顺槽：在工作面下方
         roadways.append({
             "id": f"Return-Lane-{i + 1}",
             "name": f"{wf_id}回风顺槽",
             "type": "return",
             "workface": wf_id,
             "path": [
-                {"x": real_rls.x, "y": real_rls.y},
-                {"x": real_rle.x, "y": real_rle.y}
+                {"x": real_rls[0], "y": real_rls[1]},
+                {"x": real_rle[0], "y": real_rle[1]}
             ],
-            "length": return_lane_start.distance(return_lane_end)
+            "length": lane_lengths[i]
         })
 
-        # 4. 开切眼：在工作面右侧（推进终点），垂直连接运输顺槽和回风顺槽
-        cut_x = wf_right_x
-        cut_start = Point(cut_x, return_lane_y)
-        cut_end = Point(cut_x, transport_lane_y)
-        real_cs = rotate(cut_start, -rotation_angle, origin=centroid)
-        real_ce = rotate(cut_end, -rotation_angle, origin=centroid)
-
+        # 4. 开切眼：在工作面右侧（推进终点），垂直连接回风顺槽和运输顺槽
         roadways.append({
             "id": f"Cut-{i + 1}",
             "name": f"{wf_id}开切眼",
             "type": "cut",
             "workface": wf_id,
             "path": [
-                {"x": real_cs.x, "y": real_cs.y},
-                {"x": real_ce.x, "y": real_ce.y}
+                {"x": real_rle[0], "y": real_rle[1]},
+                {"x": real_tle[0], "y": real_tle[1]}
             ],
-            "length": cut_start.distance(cut_end)
+            "length": cut_lengths[i]
         })
 
     return roadways
@@ -15,6 +15,22 @@ from dataclasses import dataclass, field
 from scipy.interpolate import griddata
 from scipy.spatial import Delaunay
 import re
+import csv
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from functools import lru_cache
+
+from utils.kernels import idw_scores
+
+# 批量加载钻孔文件时的并发线程数（文件读取为 I/O 密集，线程数可略高于 CPU 核数）
+BOREHOLE_PARSE_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# 视为缺失值的单元格文本（与 pandas.read_csv 默认的 na_values 一致）
+CSV_NA_VALUES = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+})
 
 
 @dataclass
@@ -75,6 +91,8 @@ class GeologyAnalyzer:
     def __init__(self):
         self.boreholes: List[BoreholeGeology] = []
         self.target_seam: Optional[str] = None  # 目标煤层
+        # 按目标煤层缓存的钻孔数据列数组（添加钻孔后失效）
+        self._seam_arrays: Dict[Tuple[Optional[str], int], Tuple[np.ndarray, ...]] = {}
 
     def parse_borehole_csv(self, csv_content: str, borehole_id: str,
                            x: float = 0, y: float = 0) -> BoreholeGeology:
@@ -89,55 +107,52 @@ class GeologyAnalyzer:
         Returns:
             BoreholeGeology 对象
         """
-        try:
-            # 尝试不同编码
-            for encoding in ['utf-8-sig', 'utf-8', 'gbk', 'gb2312']:
-                try:
-                    from io import StringIO
-                    df = pd.read_csv(StringIO(csv_content), encoding=encoding)
-                    break
-                except:
-                    continue
-            else:
-                # 如果都失败，尝试直接解析
-                df = pd.read_csv(pd.io.common.StringIO(csv_content))
-        except Exception as e:
-            print(f"Failed to parse CSV for {borehole_id}: {e}")
+        # 内容已是解码后的文本，直接用标准库 csv 逐行读取（单个钻孔文件很小，pandas 初始化开销反而占大头）
+        rows = [row for row in csv.reader(StringIO(csv_content)) if row]
+        if not rows:
+            print(f"Failed to parse CSV for {borehole_id}: empty file")
             return BoreholeGeology(id=borehole_id, x=x, y=y)
 
         # 查找厚度列和名称列
         thickness_col = None
         name_col = None
 
-        for col in df.columns:
-            col_lower = str(col).lower()
+        for i, col in enumerate(rows[0]):
+            col_lower = col.lower()
             if '厚度' in col_lower or 'thick' in col_lower:
-                thickness_col = col
+                thickness_col = i
             if '名称' in col_lower or 'name' in col_lower or '岩性' in col_lower:
-                name_col = col
+                name_col = i
 
-        if not thickness_col or not name_col:
+        if thickness_col is None or name_col is None:
             print(f"Cannot find required columns in {borehole_id}")
             return BoreholeGeology(id=borehole_id, x=x, y=y)
 
-        # 解析各层
-        layers = []
-        current_depth = 0
-
-        for _, row in df.iterrows():
-            try:
-                name = str(row[name_col]).strip()
-                thickness = float(row[thickness_col])
-
-                layers.append({
-                    'name': name,
-                    'thickness': thickness,
-                    'top_depth': current_depth,
-                    'bottom_depth': current_depth + thickness
-                })
-                current_depth += thickness
-            except (ValueError, TypeError):
-                continue
+        # 解析各层（与按 pandas 读取时一致）：缺失的单元格（空值、NA 等，或行中缺少该列）
+        # 厚度记为 NaN、名称记为 'nan' 并保留该层；厚度为无法转换的文本时跳过该行
+        names = []
+        thicknesses = []
+        for row in rows[1:]:
+            thickness_text = row[thickness_col] if thickness_col < len(row) else ''
+            if thickness_text in CSV_NA_VALUES:
+                thickness = float('nan')
+            else:
+                try:
+                    thickness = float(thickness_text)
+                except ValueError:
+                    continue
+            name_text = row[name_col] if name_col < len(row) else ''
+            names.append('nan' if name_text in CSV_NA_VALUES else name_text.strip())
+            thicknesses.append(thickness)
+
+        # 各层底深为厚度累加和，顶深为上一层底深
+        bottom_depths = np.cumsum(thicknesses, dtype=np.float64)
+        top_depths = np.concatenate(([0.0], bottom_depths[:-1]))
+        layers = [
+            {'name': name, 'thickness': thickness, 'top_depth': top, 'bottom_depth': bottom}
+            for name, thickness, top, bottom in zip(names, thicknesses, top_depths.tolist(), bottom_depths.tolist())
+        ]
+        current_depth = float(bottom_depths[-1]) if len(bottom_depths) else 0.0
 
         # 创建钻孔对象
         borehole = BoreholeGeology(
@@ -202,20 +217,13 @@ class GeologyAnalyzer:
         return False
 
     def _normalize_seam_name(self, name: str) -> str:
-        """标准化煤层名称，便于跨钻孔匹配"""
-        # 移除空格，统一分隔符
-        name = name.replace(' ', '').replace('_', '-')
-        # 提取数字部分
-        match = self.COAL_PATTERN.search(name)
-        if match:
-            base = match.group(1)
-            suffix = match.group(2) or ''
-            return f"{base}{suffix}煤"
-        return name
+        """标准化煤层名称，便于跨钻孔匹配（结果按名称全局缓存）"""
+        return _normalize_seam_name(name)
 
     def add_borehole(self, borehole: BoreholeGeology):
         """添加钻孔到分析器"""
         self.boreholes.append(borehole)
+        self._seam_arrays.clear()
 
     def get_seam_names(self) -> List[str]:
         """获取所有发现的煤层名称"""
@@ -290,13 +298,19 @@ class GeologyAnalyzer:
         points = np.array(points)
 
         # 使用最小二乘法拟合平面 z = ax + by + c
-        A = np.c_[points[:, 0], points[:, 1], np.ones(len(points))]
-        z = points[:, 2]
+        # 坐标先减去均值（测量坐标数值很大，中心化后法方程条件数可控，且 c 项消去），
+        # 再直接解 2x2 法方程 (ATA) * [a, b] = AT * z，避免 lstsq 内部的 SVD
+        centered = points - points.mean(axis=0)
+        A = centered[:, :2]
+        z = centered[:, 2]
 
-        # 求解 (ATA)^-1 * AT * z
         try:
-            coeffs, residuals, rank, s = np.linalg.lstsq(A, z, rcond=None)
-            a, b, c = coeffs
+            try:
+                a, b = np.linalg.solve(A.T @ A, A.T @ z)
+            except np.linalg.LinAlgError:
+                # 钻孔共线等退化情况，回退到最小范数解
+                a, b = np.linalg.lstsq(A, z, rcond=None)[0]
+            residuals = z - A @ np.array([a, b])
 
             # 计算倾角 (法向量与z轴夹角的余角)
             # 平面法向量 n = (-a, -b, 1)
@@ -315,9 +329,9 @@ class GeologyAnalyzer:
             # 走向 = 倾向 + 90° 或 - 90°
             strike_direction = (dip_direction + 90) % 360
 
-            # 计算拟合质量
-            if len(residuals) > 0:
-                rmse = np.sqrt(residuals[0] / len(points))
+            # 计算拟合质量（恰好 3 个点时平面必然精确通过，残差不能反映拟合质量）
+            if len(points) > 3:
+                rmse = np.sqrt(np.mean(residuals ** 2))
                 confidence = 'high' if rmse < 5 else ('medium' if rmse < 15 else 'low')
             else:
                 confidence = 'medium'
@@ -353,51 +367,20 @@ class GeologyAnalyzer:
         Returns:
             各项评分和综合评分
         """
-        # 收集目标煤层在各钻孔的数据
-        data_points = []
-        for bh in self.boreholes:
-            for seam in bh.coal_seams:
-                if target_seam is None or self._normalize_seam_name(seam.name) == target_seam:
-                    data_points.append({
-                        'x': bh.x,
-                        'y': bh.y,
-                        'thickness': seam.thickness,
-                        'depth': seam.depth,
-                        'roof_rock': seam.roof_rock,
-                        'floor_rock': seam.floor_rock
-                    })
-                    break
-
-        if not data_points:
+        bh_x, bh_y, thickness, roof_scores, floor_scores = self._build_seam_arrays(target_seam)
+        if not len(bh_x):
             return {'total_score': 50, 'message': '无数据'}
 
-        # IDW 插值
-        weights = []
-        for dp in data_points:
-            dist = np.sqrt((dp['x'] - x) ** 2 + (dp['y'] - y) ** 2)
-            if dist < 1:
-                dist = 1  # 避免除零
-            weights.append(1 / dist ** 2)
-
-        total_weight = sum(weights)
-        weights = [w / total_weight for w in weights]
-
-        # 插值煤厚
-        avg_thickness = sum(dp['thickness'] * w for dp, w in zip(data_points, weights))
-
-        # 插值顶板评分
-        roof_scores = []
-        for dp in data_points:
-            roof_score = self._get_rock_score(dp['roof_rock'], 'roof')
-            roof_scores.append(roof_score)
-        avg_roof_score = sum(s * w for s, w in zip(roof_scores, weights))
-
-        # 插值底板评分
-        floor_scores = []
-        for dp in data_points:
-            floor_score = self._get_rock_score(dp['floor_rock'], 'floor')
-            floor_scores.append(floor_score)
-        avg_floor_score = sum(s * w for s, w in zip(floor_scores, weights))
+        # IDW 插值：距离小于 1 时按 1 计避免除零
+        d2 = (bh_x - x) ** 2 + (bh_y - y) ** 2
+        np.maximum(d2, 1, out=d2)
+        weights = 1.0 / d2
+        weights /= weights.sum()
+
+        # 插值煤厚、顶板评分、底板评分
+        avg_thickness = float(weights @ thickness)
+        avg_roof_score = float(weights @ roof_scores)
+        avg_floor_score = float(weights @ floor_scores)
 
         # 计算煤厚评分 (0.8-5m 为佳)
         if avg_thickness < 0.8:
@@ -424,24 +407,77 @@ class GeologyAnalyzer:
             'roof_score': round(avg_roof_score, 1),
             'floor_score': round(avg_floor_score, 1),
             'interpolated_thickness': round(avg_thickness, 2),
-            'data_points_count': len(data_points)
+            'data_points_count': len(bh_x)
         }
 
-    def _get_rock_score(self, rock_name: str, rock_type: str = 'roof') -> float:
-        """获取岩性评分"""
-        if not rock_name:
-            return 50
+    def calculate_scores_at_points(self, xs: np.ndarray, ys: np.ndarray,
+                                   target_seam: str = None) -> Dict[str, np.ndarray]:
+        """
+        批量计算多个点的综合可采性评分
 
-        # 根据类型选择评分标准
-        score_dict = self.ROCK_HARDNESS if rock_type == 'roof' else self.ROCK_WATER_STABILITY
+        与 calculate_score_at_point 的 IDW 插值和评分规则相同，
+        但钻孔数据只收集一次，所有点的权重矩阵一次算出
 
-        # 模糊匹配
-        rock_name = rock_name.strip()
-        for key, score in score_dict.items():
-            if key in rock_name:
-                return score
+        Args:
+            xs, ys: 坐标数组
+            target_seam: 目标煤层
+
+        Returns:
+            {'total_score': (N,) 综合评分, 'interpolated_thickness': (N,) 插值煤厚}，
+            无数据时评分为 50、煤厚为 0
+        """
+        xs = np.asarray(xs, dtype=np.float64).ravel()
+        ys = np.asarray(ys, dtype=np.float64).ravel()
 
-        return 50  # 默认分数
+        bh_x, bh_y, thickness, roof_scores, floor_scores = self._build_seam_arrays(target_seam)
+
+        if not len(bh_x):
+            return {
+                'total_score': np.full(len(xs), 50.0),
+                'interpolated_thickness': np.zeros(len(xs)),
+            }
+
+        # IDW 插值与评分计算（安装 numba 时编译为并行循环）
+        total_score, avg_thickness = idw_scores(
+            xs, ys, bh_x, bh_y, thickness, roof_scores, floor_scores
+        )
+
+        return {
+            'total_score': np.array([round(v, 1) for v in total_score.tolist()]),
+            'interpolated_thickness': np.array([round(v, 2) for v in avg_thickness.tolist()]),
+        }
+
+    def _build_seam_arrays(self, target_seam: str = None) -> Tuple[np.ndarray, ...]:
+        """
+        收集目标煤层在各钻孔的数据（每个钻孔取第一个匹配的煤层），按列返回
+
+        Returns:
+            (x, y, 煤厚, 顶板评分, 底板评分) 五个等长 float64 数组，无数据时为空数组
+        """
+        key = (target_seam, len(self.boreholes))
+        cached = self._seam_arrays.get(key)
+        if cached is not None:
+            return cached
+
+        rows = []
+        for bh in self.boreholes:
+            for seam in bh.coal_seams:
+                if target_seam is None or self._normalize_seam_name(seam.name) == target_seam:
+                    rows.append((
+                        bh.x, bh.y, seam.thickness,
+                        self._get_rock_score(seam.roof_rock, 'roof'),
+                        self._get_rock_score(seam.floor_rock, 'floor')
+                    ))
+                    break
+
+        columns = np.array(rows, dtype=np.float64).reshape(-1, 5).T
+        result = tuple(np.ascontiguousarray(c) for c in columns)
+        self._seam_arrays[key] = result
+        return result
+
+    def _get_rock_score(self, rock_name: str, rock_type: str = 'roof') -> float:
+        """获取岩性评分（结果按岩性名称全局缓存）"""
+        return _rock_score(rock_name, rock_type)
 
     def generate_score_grid(self, boundary_points: List[Dict],
                             target_seam: str = None,
@@ -470,26 +506,26 @@ class GeologyAnalyzer:
         x_range = np.linspace(min_x, max_x, resolution)
         y_range = np.linspace(min_y, max_y, resolution)
 
-        grid = []
-        scores = []
+        # 网格点按 x 外层、y 内层排列，所有点一次批量评分
+        grid_x, grid_y = np.meshgrid(x_range, y_range, indexing='ij')
+        score_data = self.calculate_scores_at_points(grid_x, grid_y, target_seam)
+        scores = score_data['total_score']
 
-        for x in x_range:
-            for y in y_range:
-                score_data = self.calculate_score_at_point(x, y, target_seam)
-                grid.append({
-                    'x': round(x, 2),
-                    'y': round(y, 2),
-                    'score': score_data['total_score'],
-                    'thickness': score_data.get('interpolated_thickness', 0)
-                })
-                scores.append(score_data['total_score'])
+        grid = [
+            {'x': round(x, 2), 'y': round(y, 2), 'score': score, 'thickness': thickness}
+            for x, y, score, thickness in zip(
+                grid_x.ravel().tolist(), grid_y.ravel().tolist(), scores.tolist(),
+                score_data['interpolated_thickness'].tolist())
+        ]
 
+        # 统计量直接在评分数组上计算
+        has_scores = scores.size > 0
         return {
             'grid': grid,
             'stats': {
-                'min_score': round(min(scores), 1) if scores else 0,
-                'max_score': round(max(scores), 1) if scores else 100,
-                'avg_score': round(np.mean(scores), 1) if scores else 50
+                'min_score': round(float(scores.min()), 1) if has_scores else 0,
+                'max_score': round(float(scores.max()), 1) if has_scores else 100,
+                'avg_score': round(scores.mean(), 1) if has_scores else 50
             },
             'resolution': resolution,
             'bounds': {
@@ -535,6 +571,45 @@ class GeologyAnalyzer:
         }
 
 
+# 煤层名称与岩性名称的种类很少（通常几十种），而钻孔、分层、网格点会反复查询同一名称，
+# 结果在所有分析器实例间共享缓存（路由每次请求都会新建 GeologyAnalyzer）
+
+# 煤层名称字符替换表：删除空格，下划线统一为连字符
+_SEAM_NAME_TABLE = str.maketrans({' ': None, '_': '-'})
+
+
+@lru_cache(maxsize=None)
+def _normalize_seam_name(name: str) -> str:
+    """标准化煤层名称，便于跨钻孔匹配"""
+    # 移除空格，统一分隔符（一次 translate 完成）
+    name = name.translate(_SEAM_NAME_TABLE)
+    # 提取数字部分
+    match = GeologyAnalyzer.COAL_PATTERN.search(name)
+    if match:
+        base = match.group(1)
+        suffix = match.group(2) or ''
+        return f"{base}{suffix}煤"
+    return name
+
+
+@lru_cache(maxsize=None)
+def _rock_score(rock_name: str, rock_type: str = 'roof') -> float:
+    """按岩性名称模糊匹配评分"""
+    if not rock_name:
+        return 50
+
+    # 根据类型选择评分标准
+    score_dict = GeologyAnalyzer.ROCK_HARDNESS if rock_type == 'roof' else GeologyAnalyzer.ROCK_WATER_STABILITY
+
+    # 模糊匹配
+    rock_name = rock_name.strip()
+    for key, score in score_dict.items():
+        if key in rock_name:
+            return score
+
+    return 50  # 默认分数
+
+
 def analyze_boreholes_from_files(borehole_dir: str, coord_file: str,
                                   target_seam: str = None) -> GeologyAnalyzer:
     """
@@ -548,8 +623,6 @@ def analyze_boreholes_from_files(borehole_dir: str, coord_file: str,
     Returns:
         GeologyAnalyzer 实例
     """
-    import os
-
     analyzer = GeologyAnalyzer()
 
     # 读取坐标文件
@@ -561,18 +634,16 @@ def analyze_boreholes_from_files(borehole_dir: str, coord_file: str,
         x_col = next((c for c in coord_df.columns if 'x' in c.lower()), coord_df.columns[1])
         y_col = next((c for c in coord_df.columns if 'y' in c.lower()), coord_df.columns[2])
 
-        for _, row in coord_df.iterrows():
-            name = str(row[name_col]).strip()
-            coords[name] = (float(row[x_col]), float(row[y_col]))
+        for name, x, y in zip(coord_df[name_col].to_numpy(), coord_df[x_col].to_numpy(), coord_df[y_col].to_numpy()):
+            coords[str(name).strip()] = (float(x), float(y))
     except Exception as e:
         print(f"Error reading coordinate file: {e}")
         return analyzer
 
-    # 读取各钻孔数据
-    for filename in os.listdir(borehole_dir):
-        if not filename.endswith('.csv'):
-            continue
+    # 读取各钻孔数据：各文件相互独立，用线程池并发读取和解析，再按文件顺序在主线程中加入分析器
+    filenames = [f for f in os.listdir(borehole_dir) if f.endswith('.csv')]
 
+    def _parse_one(filename: str) -> Optional[BoreholeGeology]:
         borehole_id = filename.rsplit('.', 1)[0]
         filepath = os.path.join(borehole_dir, filename)
 
@@ -582,10 +653,15 @@ def analyze_boreholes_from_files(borehole_dir: str, coord_file: str,
         try:
             with open(filepath, 'r', encoding='utf-8-sig') as f:
                 content = f.read()
-            borehole = analyzer.parse_borehole_csv(content, borehole_id, x, y)
-            analyzer.add_borehole(borehole)
+            return analyzer.parse_borehole_csv(content, borehole_id, x, y)
         except Exception as e:
             print(f"Error reading {filename}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(BOREHOLE_PARSE_WORKERS, max(len(filenames), 1))) as executor:
+        for borehole in executor.map(_parse_one, filenames):
+            if borehole is not None:
+                analyzer.add_borehole(borehole)
 
     analyzer.target_seam = target_seam
     return analyzer
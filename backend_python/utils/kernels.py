@@ -0,0 +1,341 @@
+"""
+数值计算内核
+
+几何/插值等密集数值循环集中在此模块：
+1. 安装了 numba 时使用 @njit 编译为机器码（cache=True，编译结果缓存到磁盘）
+2. 未安装 numba 时回退到等价的 NumPy 向量化实现
+
+numba 为可选依赖，调用方无需关心当前使用的是哪种实现
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:  # pragma: no cover - 取决于运行环境
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """numba 不可用时的占位装饰器，原样返回函数"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+# ============ 巷道双线偏移 ============
+
+@njit(cache=True)
+def _roadway_offsets_jit(pts, half_width):
+    n = pts.shape[0]
+    left = np.empty((n, 2))
+    right = np.empty((n, 2))
+
+    for i in range(n):
+        if i == 0:
+            # 起点：使用第一段的方向
+            dx = pts[1, 0] - pts[0, 0]
+            dy = pts[1, 1] - pts[0, 1]
+        elif i == n - 1:
+            # 终点：使用最后一段的方向
+            dx = pts[n - 1, 0] - pts[n - 2, 0]
+            dy = pts[n - 1, 1] - pts[n - 2, 1]
+        else:
+            # 中间点：使用前后两段的平均方向
+            dx = pts[i + 1, 0] - pts[i - 1, 0]
+            dy = pts[i + 1, 1] - pts[i - 1, 1]
+
+        length = np.sqrt(dx * dx + dy * dy)
+        if length > 0:
+            nx = -dy / length
+            ny = dx / length
+        else:
+            nx = 0.0
+            ny = 1.0
+
+        left[i, 0] = pts[i, 0] + nx * half_width
+        left[i, 1] = pts[i, 1] + ny * half_width
+        right[i, 0] = pts[i, 0] - nx * half_width
+        right[i, 1] = pts[i, 1] - ny * half_width
+
+    return left, right
+
+
+def _roadway_offsets_numpy(pts, half_width):
+    # 各点前进方向：起点用第一段、终点用最后一段、中间点用前后两段的平均方向
+    fwd = np.empty_like(pts)
+    fwd[1:-1] = pts[2:] - pts[:-2]
+    fwd[0] = pts[1] - pts[0]
+    fwd[-1] = pts[-1] - pts[-2]
+
+    # 法向量（垂直于前进方向），零长度方向取 (0, 1)
+    lengths = np.hypot(fwd[:, 0], fwd[:, 1])
+    normals = np.zeros_like(pts)
+    normals[:, 1] = 1.0
+    valid = lengths > 0
+    normals[valid, 0] = -fwd[valid, 1] / lengths[valid]
+    normals[valid, 1] = fwd[valid, 0] / lengths[valid]
+
+    offset = normals * half_width
+    return pts + offset, pts - offset
+
+
+def roadway_offsets(pts: np.ndarray, half_width: float):
+    """
+    计算巷道中心线两侧的边线点
+
+    Args:
+        pts: (N, 2) float64 中心线坐标，N >= 2
+        half_width: 巷道半宽
+
+    Returns:
+        (left, right) 两个 (N, 2) 数组
+    """
+    if NUMBA_AVAILABLE:
+        return _roadway_offsets_jit(pts, float(half_width))
+    return _roadway_offsets_numpy(pts, half_width)
+
+
+# ============ 三角网线性插值 ============
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _barycentric_jit(xi, simplex_idx, transform, simplices, values, fill_value):
+    n = xi.shape[0]
+    out = np.empty(n)
+
+    for i in prange(n):
+        s = simplex_idx[i]
+        if s < 0:
+            # 凸包外的点
+            out[i] = fill_value
+            continue
+
+        dx = xi[i, 0] - transform[s, 2, 0]
+        dy = xi[i, 1] - transform[s, 2, 1]
+        b0 = transform[s, 0, 0] * dx + transform[s, 0, 1] * dy
+        b1 = transform[s, 1, 0] * dx + transform[s, 1, 1] * dy
+        b2 = 1.0 - b0 - b1
+
+        out[i] = (b0 * values[simplices[s, 0]]
+                  + b1 * values[simplices[s, 1]]
+                  + b2 * values[simplices[s, 2]])
+
+    return out
+
+
+def _barycentric_numpy(xi, simplex_idx, transform, simplices, values, fill_value):
+    inside = simplex_idx >= 0
+    s = simplex_idx[inside]
+
+    # 重心坐标：b = T · (x - r)，第三个分量为 1 - b0 - b1
+    b = np.einsum('nij,nj->ni', transform[s, :2], xi[inside] - transform[s, 2])
+    weights = np.column_stack([b, 1.0 - b.sum(axis=1)])
+
+    out = np.full(xi.shape[0], fill_value)
+    out[inside] = (weights * values[simplices[s]]).sum(axis=1)
+    return out
+
+
+def barycentric_interpolate(tri, values: np.ndarray, xi: np.ndarray, fill_value: float = np.nan) -> np.ndarray:
+    """
+    在 Delaunay 三角网上做线性（重心坐标）插值，结果与 griddata(method='linear') 一致
+
+    Args:
+        tri: scipy.spatial.Delaunay 三角网（二维）
+        values: (M,) 各数据点的值
+        xi: (N, 2) 待插值点坐标
+        fill_value: 凸包外点的取值
+
+    Returns:
+        (N,) 插值结果
+    """
+    xi = np.ascontiguousarray(xi, dtype=np.float64)
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    # 查找所在三角形由 Qhull（C 实现）完成，内核只负责加权求和
+    simplex_idx = tri.find_simplex(xi)
+
+    if NUMBA_AVAILABLE:
+        return _barycentric_jit(xi, simplex_idx, tri.transform, tri.simplices, values, float(fill_value))
+    return _barycentric_numpy(xi, simplex_idx, tri.transform, tri.simplices, values, fill_value)
+
+
+# ============ 点在多边形内判断 ============
+
+@njit(parallel=True, cache=True)
+def _points_in_polygon_jit(points, polygon):
+    n = points.shape[0]
+    m = polygon.shape[0]
+    inside = np.zeros(n, dtype=np.bool_)
+
+    for i in prange(n):
+        px = points[i, 0]
+        py = points[i, 1]
+        result = False
+        j = m - 1
+        for k in range(m):
+            xk = polygon[k, 0]
+            yk = polygon[k, 1]
+            xj = polygon[j, 0]
+            yj = polygon[j, 1]
+            if (yk > py) != (yj > py):
+                if px < (xj - xk) * (py - yk) / (yj - yk) + xk:
+                    result = not result
+            j = k
+        inside[i] = result
+
+    return inside
+
+
+def _points_in_polygon_numpy(points, polygon):
+    px = points[:, 0:1]
+    py = points[:, 1:2]
+    xk, yk = polygon[:, 0], polygon[:, 1]
+    # 每条边的另一端点（前一个顶点，首点与末点相连）
+    xj, yj = np.roll(xk, 1), np.roll(yk, 1)
+
+    crosses = (yk > py) != (yj > py)
+    # 只有跨越水平射线的边参与交点计算，此时 yj != yk，不会除零
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cross = (xj - xk) * (py - yk) / (yj - yk) + xk
+    crossings = crosses & (px < x_cross)
+
+    return (np.count_nonzero(crossings, axis=1) & 1).astype(bool)
+
+
+def points_in_polygon(points: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """
+    射线法（PNPOLY）判断各点是否位于多边形内
+
+    Args:
+        points: (N, 2) 待判断点坐标
+        polygon: (M, 2) 多边形顶点，首尾无需重复
+
+    Returns:
+        (N,) bool 数组，边界上的点结果不确定
+    """
+    points = np.ascontiguousarray(points, dtype=np.float64).reshape(-1, 2)
+    polygon = np.ascontiguousarray(polygon, dtype=np.float64).reshape(-1, 2)
+    if len(polygon) < 3:
+        return np.zeros(len(points), dtype=bool)
+
+    if NUMBA_AVAILABLE:
+        return _points_in_polygon_jit(points, polygon)
+    return _points_in_polygon_numpy(points, polygon)
+
+
+# ============ 工作面长度搜索 ============
+
+@njit(cache=True)
+def best_face_length(available_length: float, min_len: float, max_len: float,
+                     preferred: float, pillar: float) -> float:
+    """
+    在 [min_len, max_len] 内以 10m 步长搜索工作面长度，使条带剩余长度最小
+
+    Args:
+        available_length: 沿工作面方向的可用长度
+        min_len, max_len: 规程允许的工作面长度范围
+        preferred: 无可行解时使用的推荐长度
+        pillar: 区段煤柱宽度
+
+    Returns:
+        最佳工作面长度
+    """
+    best_length = preferred
+    best_waste = np.inf
+
+    for test_length in range(int(min_len), int(max_len) + 1, 10):
+        # 计算可以放置的工作面数量
+        num_faces = int((available_length + pillar) / (test_length + pillar))
+        if num_faces < 1:
+            continue
+
+        # 计算总占用
+        total_used = num_faces * test_length + (num_faces - 1) * pillar
+        waste = available_length - total_used
+
+        if 0 <= waste < best_waste:
+            best_waste = waste
+            best_length = float(test_length)
+
+    return best_length
+
+
+# ============ 钻孔 IDW 可采性评分 ============
+
+# 煤厚评分分段：煤厚 < 0.8 / 1.3 / 3.5 / 6 及以上依次为
+# 不可采 / 薄煤层 / 中厚煤层（最佳）/ 厚煤层 / 特厚煤层
+THICKNESS_BREAKS = np.array([0.8, 1.3, 3.5, 6.0])
+THICKNESS_SCORES = np.array([20.0, 60.0, 90.0, 80.0, 70.0])
+
+# 综合评分权重：煤厚、顶板、底板
+SCORE_WEIGHTS = (0.40, 0.35, 0.25)
+
+
+@njit(parallel=True, cache=True)
+def _idw_scores_jit(xs, ys, bh_x, bh_y, thickness, roof_scores, floor_scores):
+    n = xs.shape[0]
+    m = bh_x.shape[0]
+    total = np.empty(n)
+    avg_thickness = np.empty(n)
+
+    for i in prange(n):
+        weight_sum = 0.0
+        thk = 0.0
+        roof = 0.0
+        floor = 0.0
+        for j in range(m):
+            dx = xs[i] - bh_x[j]
+            dy = ys[i] - bh_y[j]
+            # 距离小于 1 时按 1 计，避免除零
+            w = 1.0 / max(dx * dx + dy * dy, 1.0)
+            weight_sum += w
+            thk += w * thickness[j]
+            roof += w * roof_scores[j]
+            floor += w * floor_scores[j]
+        thk /= weight_sum
+
+        k = 0
+        while k < THICKNESS_BREAKS.shape[0] and thk >= THICKNESS_BREAKS[k]:
+            k += 1
+        total[i] = (THICKNESS_SCORES[k] * SCORE_WEIGHTS[0]
+                    + roof / weight_sum * SCORE_WEIGHTS[1]
+                    + floor / weight_sum * SCORE_WEIGHTS[2])
+        avg_thickness[i] = thk
+
+    return total, avg_thickness
+
+
+def _idw_scores_numpy(xs, ys, bh_x, bh_y, thickness, roof_scores, floor_scores):
+    # (N, M) 距离平方矩阵，距离小于 1 时按 1 计避免除零
+    d2 = (xs[:, None] - bh_x) ** 2 + (ys[:, None] - bh_y) ** 2
+    np.maximum(d2, 1, out=d2)
+    weights = 1.0 / d2
+    weights /= weights.sum(axis=1, keepdims=True)
+
+    avg_thickness = weights @ thickness
+    thickness_score = THICKNESS_SCORES[np.digitize(avg_thickness, THICKNESS_BREAKS)]
+    total = (thickness_score * SCORE_WEIGHTS[0]
+             + (weights @ roof_scores) * SCORE_WEIGHTS[1]
+             + (weights @ floor_scores) * SCORE_WEIGHTS[2])
+    return total, avg_thickness
+
+
+def idw_scores(xs: np.ndarray, ys: np.ndarray, bh_x: np.ndarray, bh_y: np.ndarray,
+               thickness: np.ndarray, roof_scores: np.ndarray, floor_scores: np.ndarray):
+    """
+    反距离平方加权（IDW）插值煤厚与顶底板评分，并计算综合可采性评分
+
+    Args:
+        xs, ys: (N,) 待评分点坐标
+        bh_x, bh_y: (M,) 钻孔坐标，M >= 1
+        thickness, roof_scores, floor_scores: (M,) 各钻孔煤厚与顶底板岩性评分
+
+    Returns:
+        (total_score, avg_thickness) 两个 (N,) 数组，均未取整
+    """
+    args = [np.ascontiguousarray(a, dtype=np.float64)
+            for a in (xs, ys, bh_x, bh_y, thickness, roof_scores, floor_scores)]
+    if NUMBA_AVAILABLE:
+        return _idw_scores_jit(*args)
+    return _idw_scores_numpy(*args)
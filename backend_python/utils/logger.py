@@ -1,11 +1,88 @@
 """
 日志配置模块 - 提供统一的日志记录功能
 """
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
 import sys
-from datetime import datetime
+import time
+from datetime import date
 from pathlib import Path
 
+# 日志输出目标：'file'（默认，写入 logs 目录）、'syslog'（本机 syslog 套接字）、
+# 'journal'（由 systemd 启动时，标准输出已被 journald 收集，不再另写文件）
+LOG_SINK = os.getenv("MINING_LOG_SINK") or ("journal" if os.getenv("JOURNAL_STREAM") else "file")
+SYSLOG_ADDRESS = "/dev/log"
+
+# 文件日志缓冲的记录条数
+FILE_LOG_BUFFER_CAPACITY = 512
+# 单个日志文件大小上限及保留的滚动备份数
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 20
+# 日志目录及当天日志文件路径，导入时解析一次；跨天不切换文件，重启进程后按新日期命名
+LOG_DIR = Path(__file__).resolve().parent.parent / "logs"
+LOG_FILE = LOG_DIR / f"mining_{date.today():%Y%m%d}.log"
+
+
+class CachedTimeFormatter(logging.Formatter):
+    """按秒缓存时间字符串的格式化器，同一秒内的多条记录只调用一次 strftime"""
+
+    def __init__(self, fmt=None, datefmt=None):
+        super().__init__(fmt, datefmt)
+        self._cached_second = None
+        self._cached_time = ''
+
+    def formatTime(self, record, datefmt=None):
+        # 记录均在 QueueListener 的单个后台线程中格式化，缓存无需加锁
+        second = int(record.created)
+        if second != self._cached_second:
+            self._cached_second = second
+            self._cached_time = time.strftime(datefmt or self.default_time_format, self.converter(second))
+        if datefmt or not self.default_msec_format:
+            return self._cached_time
+        # 未指定 datefmt 时与基类一致，附加毫秒
+        return self.default_msec_format % (self._cached_time, record.msecs)
+
+
+def _create_file_handler() -> logging.Handler:
+    """创建按日期命名、按大小滚动、带内存缓冲的文件处理器（DEBUG及以上级别）"""
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    # 单个日志文件超过上限后滚动，最多保留 LOG_BACKUP_COUNT 个备份；delay=True 首次写入时才打开文件
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8', delay=True
+    )
+    file_handler.setLevel(logging.DEBUG)
+    file_format = CachedTimeFormatter(
+        '%(asctime)s | %(levelname)-8s | %(name)s | %(funcName)s:%(lineno)d | %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    file_handler.setFormatter(file_format)
+    # 文件写入先在内存中攒批，满 FILE_LOG_BUFFER_CAPACITY 条或遇到 WARNING 及以上级别时一次写出
+    # （告警不会长时间滞留内存，进程被强制终止时也已落盘）；退出时 logging.shutdown 会把剩余记录刷到文件
+    buffered_file_handler = logging.handlers.MemoryHandler(
+        FILE_LOG_BUFFER_CAPACITY, flushLevel=logging.WARNING, target=file_handler
+    )
+    buffered_file_handler.setLevel(logging.DEBUG)
+    return buffered_file_handler
+
+
+def _create_syslog_handler() -> logging.Handler:
+    """创建写入本机 syslog 套接字的处理器，由 rsyslog/journald 负责落盘和滚动（DEBUG及以上级别）"""
+    # 套接字不存在时 SysLogHandler 不会在构造时报错，而是每条记录都报错，这里提前检查
+    if not os.path.exists(SYSLOG_ADDRESS):
+        raise FileNotFoundError(f"syslog 套接字不存在: {SYSLOG_ADDRESS}")
+    syslog_handler = logging.handlers.SysLogHandler(
+        address=SYSLOG_ADDRESS, facility=logging.handlers.SysLogHandler.LOG_LOCAL0
+    )
+    syslog_handler.setLevel(logging.DEBUG)
+    syslog_handler.setFormatter(logging.Formatter(
+        '%(name)s: %(levelname)s %(funcName)s:%(lineno)d | %(message)s'
+    ))
+    return syslog_handler
+
+
 def setup_logger(name: str = "mining_design", log_level: str = "INFO") -> logging.Logger:
     """
     设置并返回配置好的logger
@@ -24,52 +101,50 @@ def setup_logger(name: str = "mining_design", log_level: str = "INFO") -> loggin
         return logger
 
     logger.setLevel(getattr(logging, log_level.upper(), logging.INFO))
+    handlers = []
+    file_error = None
 
     # 控制台处理器 - INFO及以上级别
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
-    console_format = logging.Formatter(
+    console_format = CachedTimeFormatter(
         '%(asctime)s | %(levelname)-8s | %(message)s',
         datefmt='%H:%M:%S'
     )
     console_handler.setFormatter(console_format)
-    logger.addHandler(console_handler)
+    handlers.append(console_handler)
 
-    # 文件处理器 - DEBUG及以上级别
+    # 持久化处理器 - DEBUG及以上级别
     try:
-        log_dir = Path(__file__).parent.parent / "logs"
-        log_dir.mkdir(exist_ok=True)
-
-        log_file = log_dir / f"mining_{datetime.now():%Y%m%d}.log"
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
-        file_handler.setLevel(logging.DEBUG)
-        file_format = logging.Formatter(
-            '%(asctime)s | %(levelname)-8s | %(name)s | %(funcName)s:%(lineno)d | %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        file_handler.setFormatter(file_format)
-        logger.addHandler(file_handler)
+        if LOG_SINK == "syslog":
+            handlers.append(_create_syslog_handler())
+        elif LOG_SINK == "file":
+            handlers.append(_create_file_handler())
     except Exception as e:
-        # 如果无法创建文件日志，只使用控制台
-        logger.warning(f"无法创建文件日志: {e}")
+        # 如果无法创建持久化日志，只使用控制台
+        file_error = e
+
+    # 请求线程只把日志记录放入队列，控制台/文件写入由后台监听线程完成，
+    # 避免磁盘 I/O 阻塞请求处理
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # 退出时停止监听线程，确保队列中剩余日志写出
+    atexit.register(listener.stop)
+
+    if file_error is not None:
+        logger.warning(f"无法创建{LOG_SINK}日志: {file_error}")
 
     return logger
 
 # 创建默认logger实例
 logger = setup_logger()
 
-# 便捷的日志函数
-def log_info(message: str):
-    """记录INFO级别日志"""
-    logger.info(message)
-
-def log_debug(message: str):
-    """记录DEBUG级别日志"""
-    logger.debug(message)
-
-def log_warning(message: str):
-    """记录WARNING级别日志"""
-    logger.warning(message)
+# 便捷的日志函数：直接绑定 logger 的方法，调用时少一层函数包装
+log_info = logger.info          # 记录INFO级别日志
+log_debug = logger.debug        # 记录DEBUG级别日志
+log_warning = logger.warning    # 记录WARNING级别日志
 
 def log_error(message: str, exc_info: bool = False):
     """记录ERROR级别日志，可选是否包含异常堆栈"""
@@ -77,6 +152,9 @@ def log_error(message: str, exc_info: bool = False):
 
 def log_api_request(method: str, path: str, status_code: int = None, duration_ms: float = None):
     """记录API请求日志"""
+    # INFO 被过滤时不拼接消息
+    if not logger.isEnabledFor(logging.INFO):
+        return
     parts = [f"{method} {path}"]
     if status_code:
         parts.append(f"-> {status_code}")
@@ -86,6 +164,8 @@ def log_api_request(method: str, path: str, status_code: int = None, duration_ms
 
 def log_design_operation(operation: str, details: dict = None):
     """记录设计操作日志"""
+    if not logger.isEnabledFor(logging.INFO):
+        return
     msg = f"[设计] {operation}"
     if details:
         detail_str = ", ".join(f"{k}={v}" for k, v in details.items())
@@ -5,13 +5,19 @@
 """
 
 from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
 import numpy as np
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class MiningRules:
-    """采矿规程参数配置类"""
+    """
+    采矿规程参数配置类
+
+    实例不可变（可哈希，便于按规程缓存计算结果），需要调整参数时用
+    dataclasses.replace 或 from_dict 构造新实例
+    """
 
     # ==================== 工作面几何约束 ====================
 
@@ -71,7 +77,8 @@ class MiningRules:
     # ==================== 评分权重 ====================
 
     # 各项指标在综合评分中的权重
-    score_weights: Dict[str, float] = field(default_factory=lambda: {
+    # 字典不可哈希，不参与实例哈希（仍参与相等比较）
+    score_weights: Dict[str, float] = field(hash=False, default_factory=lambda: {
         'coal_thickness': 0.35,    # 煤厚权重 (最重要)
         'roof_stability': 0.25,    # 顶板稳定性
         'gas_content': 0.20,       # 瓦斯含量
@@ -203,7 +210,10 @@ class MiningRules:
         }
 
     def to_dict(self) -> Dict:
-        """转换为字典，便于前端使用"""
+        """转换为字典，便于前端使用（按规程缓存，返回结果请勿修改）"""
+        return _rules_to_dict(self)
+
+    def _build_dict(self) -> Dict:
         return {
             'faceLength': {
                 'min': self.face_length_min,
@@ -249,50 +259,57 @@ class MiningRules:
     @classmethod
     def from_dict(cls, data: Dict) -> 'MiningRules':
         """从字典创建实例"""
-        rules = cls()
+        defaults = cls()
+        values = {}
 
         if 'faceLength' in data:
             fl = data['faceLength']
-            rules.face_length_min = fl.get('min', rules.face_length_min)
-            rules.face_length_max = fl.get('max', rules.face_length_max)
-            rules.face_length_preferred = fl.get('preferred', rules.face_length_preferred)
+            values['face_length_min'] = fl.get('min', defaults.face_length_min)
+            values['face_length_max'] = fl.get('max', defaults.face_length_max)
+            values['face_length_preferred'] = fl.get('preferred', defaults.face_length_preferred)
 
         if 'advanceLength' in data:
             al = data['advanceLength']
-            rules.advance_length_min = al.get('min', rules.advance_length_min)
-            rules.advance_length_max = al.get('max', rules.advance_length_max)
-            rules.advance_length_preferred = al.get('preferred', rules.advance_length_preferred)
+            values['advance_length_min'] = al.get('min', defaults.advance_length_min)
+            values['advance_length_max'] = al.get('max', defaults.advance_length_max)
+            values['advance_length_preferred'] = al.get('preferred', defaults.advance_length_preferred)
 
         if 'sectionPillar' in data:
             sp = data['sectionPillar']
-            rules.section_pillar_min = sp.get('min', rules.section_pillar_min)
-            rules.section_pillar_max = sp.get('max', rules.section_pillar_max)
-            rules.section_pillar_preferred = sp.get('preferred', rules.section_pillar_preferred)
+            values['section_pillar_min'] = sp.get('min', defaults.section_pillar_min)
+            values['section_pillar_max'] = sp.get('max', defaults.section_pillar_max)
+            values['section_pillar_preferred'] = sp.get('preferred', defaults.section_pillar_preferred)
 
         if 'boundaryPillar' in data:
             bp = data['boundaryPillar']
-            rules.boundary_pillar_min = bp.get('min', rules.boundary_pillar_min)
-            rules.boundary_pillar_max = bp.get('max', rules.boundary_pillar_max)
-            rules.boundary_pillar_preferred = bp.get('preferred', rules.boundary_pillar_preferred)
+            values['boundary_pillar_min'] = bp.get('min', defaults.boundary_pillar_min)
+            values['boundary_pillar_max'] = bp.get('max', defaults.boundary_pillar_max)
+            values['boundary_pillar_preferred'] = bp.get('preferred', defaults.boundary_pillar_preferred)
 
         if 'dipAngle' in data:
             da = data['dipAngle']
-            rules.pseudo_incline_threshold = da.get('pseudoInclineThreshold', rules.pseudo_incline_threshold)
+            values['pseudo_incline_threshold'] = da.get('pseudoInclineThreshold', defaults.pseudo_incline_threshold)
 
         if 'coalThickness' in data:
             ct = data['coalThickness']
-            rules.min_minable_thickness = ct.get('minMinable', rules.min_minable_thickness)
+            values['min_minable_thickness'] = ct.get('minMinable', defaults.min_minable_thickness)
 
         if 'scoreWeights' in data:
-            rules.score_weights = data['scoreWeights']
+            values['score_weights'] = data['scoreWeights']
 
         if 'layoutDirection' in data:
-            rules.layout_direction = data['layoutDirection']
+            values['layout_direction'] = data['layoutDirection']
 
         if 'miningMethod' in data:
-            rules.mining_method = data['miningMethod']
+            values['mining_method'] = data['miningMethod']
+
+        return cls(**values)
+
 
-        return rules
+@lru_cache(maxsize=32)
+def _rules_to_dict(rules: MiningRules) -> Dict:
+    """MiningRules.to_dict 的缓存实现（实例不可变，相等的规程共用同一结果）"""
+    return rules._build_dict()
 
 
 # 默认规程实例
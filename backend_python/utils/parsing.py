@@ -1,61 +1,113 @@
 import pandas as pd
 import numpy as np
-from io import StringIO, BytesIO
-from typing import List, Dict
+from io import BytesIO
+from functools import lru_cache
+from typing import List, Dict, Optional
 
-def parse_csv_file(file_content: bytes) -> List[Dict]:
+def parse_csv_dataframe(file_content: bytes) -> pd.DataFrame:
     """
-    解析 CSV 文件内容，处理 BOM 和列名
+    解析 CSV 文件内容为 DataFrame，处理 BOM 和列名
     """
-    # 尝试解码，处理 UTF-8 BOM
+    # 直接从字节解析（C 解析器内部解码，不额外生成整份 str 副本），处理 UTF-8 BOM；
+    # 非 UTF-8 内容回到流开头按 GBK 重新解析。
+    # BytesIO(bytes) 与原字节对象共享内存、不复制，无需线程级缓冲复用
+    stream = BytesIO(file_content)
     try:
-        content_str = file_content.decode('utf-8-sig')
+        df = pd.read_csv(stream, encoding='utf-8-sig')
     except UnicodeDecodeError:
-        content_str = file_content.decode('gbk') # 尝试 GBK
-
-    df = pd.read_csv(StringIO(content_str))
+        stream.seek(0)
+        df = pd.read_csv(stream, encoding='gbk') # 尝试 GBK
     
     # 清理列名（去除空格）
     df.columns = df.columns.str.strip()
     
-    # 替换 NaN 为 None (JSON 兼容)
-    df = df.replace({np.nan: None})
-    
-    return df.to_dict(orient='records')
+    return df
+
+def dataframe_to_records(df: pd.DataFrame) -> List[Dict]:
+    """
+    DataFrame 转为记录列表，NaN 替换为 None (JSON 兼容)
+    """
+    return df.replace({np.nan: None}).to_dict(orient='records')
+
+def parse_csv_file(file_content: bytes) -> List[Dict]:
+    """
+    解析 CSV 文件内容，处理 BOM 和列名
+    """
+    return dataframe_to_records(parse_csv_dataframe(file_content))
+
+# 各数据类型的目标字段及列名匹配关键字（按优先级排列，一列只归入第一个匹配的字段）
+COLUMN_KEYWORDS = {
+    'boundary': (
+        ('x', ('x',)),
+        ('y', ('y',)),
+    ),
+    'coordinate': (
+        ('id', ('id', '编号', '孔号', 'name', '名称', '钻孔')),
+        ('x', ('x', 'east', '东')),
+        ('y', ('y', 'north', '北')),
+    ),
+}
+
+@lru_cache(maxsize=512)
+def match_column_field(type: str, column: str) -> Optional[str]:
+    """
+    按 COLUMN_KEYWORDS 确定列名对应的目标字段（不匹配返回 None）
+    同一批数据每行的列名相同，缓存后每个列名只做一次子串匹配
+    """
+    key = column.lower()
+    return next((f for f, keywords in COLUMN_KEYWORDS[type] if any(k in key for k in keywords)), None)
+
+def normalize_dataframe(df: pd.DataFrame, type: str) -> List[Dict]:
+    """
+    标准化列名（按列向量化处理，结果与 normalize_columns 一致）
+    同一字段匹配多列时，逐行取最后一个可转换的值；缺少关键字段的行被丢弃
+    """
+    fields = {}
+    for col in df.columns:
+        field = match_column_field(type, str(col))
+        if field is None:
+            continue
+
+        series = df[col]
+        if field == 'id':
+            # 与 str(v) 一致：空值转为 'None'
+            fields[field] = series.astype(str).where(series.notna(), 'None')
+        else:
+            value = pd.to_numeric(series, errors='coerce').astype(np.float64)
+            if field in fields:
+                value = value.fillna(fields[field])
+            fields[field] = value
+
+    required = [f for f, _ in COLUMN_KEYWORDS[type]]
+    if any(f not in fields for f in required):
+        return []
+
+    out = pd.DataFrame(fields)[required].dropna(subset=[f for f in required if f != 'id'])
+    return out.to_dict(orient='records')
 
 def normalize_columns(data: List[Dict], type: str) -> List[Dict]:
     """
     标准化列名
     """
-    if not data:
+    if not data or type not in COLUMN_KEYWORDS:
         return []
-        
+
+    required = [f for f, _ in COLUMN_KEYWORDS[type]]
     normalized = []
     for row in data:
         new_row = {}
         for k, v in row.items():
-            key = k.lower()
+            field = match_column_field(type, k)
+            if field is None:
+                continue
             try:
-                if type == 'boundary':
-                    if 'x' in key: new_row['x'] = float(v)
-                    elif 'y' in key: new_row['y'] = float(v)
-                elif type == 'coordinate':
-                    # 宽松匹配 ID
-                    if any(x in key for x in ['id', '编号', '孔号', 'name', '名称', '钻孔']): 
-                        new_row['id'] = str(v)
-                    # 宽松匹配 X
-                    elif any(x in key for x in ['x', 'east', '东']): 
-                        new_row['x'] = float(v)
-                    # 宽松匹配 Y
-                    elif any(x in key for x in ['y', 'north', '北']): 
-                        new_row['y'] = float(v)
+                # 宽松匹配：ID 保留为字符串，坐标转为浮点数
+                new_row[field] = str(v) if field == 'id' else float(v)
             except (ValueError, TypeError):
                 continue # 忽略无法转换的数据
         
         # 只有当关键字段存在时才添加
-        if type == 'boundary' and 'x' in new_row and 'y' in new_row:
-            normalized.append(new_row)
-        elif type == 'coordinate' and 'id' in new_row and 'x' in new_row and 'y' in new_row:
+        if all(f in new_row for f in required):
             normalized.append(new_row)
             
     return normalized
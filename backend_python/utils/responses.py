@@ -0,0 +1,17 @@
+"""
+响应构建工具
+
+钻孔列表、评分网格、地质模型等大体量响应直接用 orjson 序列化为字节返回，
+数据中的 numpy 数组（评分网格、float32 地质网格等）无需先转换为 list
+"""
+
+import orjson
+from fastapi import Response
+
+# 与数据字段持久化使用相同的选项：支持 numpy 数组及非字符串键
+from store import ORJSON_OPTIONS
+
+
+def json_response(content) -> Response:
+    """将内容用 orjson 序列化为 JSON 响应"""
+    return Response(orjson.dumps(content, option=ORJSON_OPTIONS), media_type="application/json")
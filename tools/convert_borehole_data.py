@@ -18,32 +18,26 @@ def convert_borehole_data(input_file, output_file=None):
         output_file: 输出文件路径（可选，默认为原文件名_converted.csv）
     """
     try:
-        # 读取原始数据
-        df = pd.read_csv(input_file, encoding='utf-8')
+        # 读取原始数据（只解析需要的两列）
+        required_cols = ['岩石名称', '层厚']
+        df = pd.read_csv(input_file, encoding='utf-8',
+                         usecols=lambda col: col in required_cols, dtype={'岩石名称': str})
         
         # 检查必需的列
-        required_cols = ['岩石名称', '层厚']
         if not all(col in df.columns for col in required_cols):
             print(f"错误：文件缺少必需的列 {required_cols}")
             return False
         
-        # 过滤掉空行
-        df = df[df['岩石名称'].notna() & (df['岩石名称'] != '')]
-        
-        # 从下到上重新排序（原数据从上到下）
-        df = df.iloc[::-1].reset_index(drop=True)
-        
-        # 创建新的数据框
-        converted_data = {
-            '序号(从下到上)': range(1, len(df) + 1),
-            '名称': df['岩石名称'].values,
-            '厚度/m': df['层厚'].values,
-            '弹性模量/Gpa': '',
-            '容重/kN*m-3': '',
-            '抗拉强度/MPa': ''
-        }
+        # 过滤掉空行，只保留需要的两列，并从下到上重新排序（原数据从上到下）
+        result_df = df.loc[df['岩石名称'].notna() & (df['岩石名称'] != ''), required_cols]
+        result_df = result_df.iloc[::-1].reset_index(drop=True)
         
-        result_df = pd.DataFrame(converted_data)
+        # 在同一数据框上就地改为输出格式，不再经由中间字典重建
+        result_df.columns = ['名称', '厚度/m']
+        result_df.insert(0, '序号(从下到上)', range(1, len(result_df) + 1))
+        result_df['弹性模量/Gpa'] = ''
+        result_df['容重/kN*m-3'] = ''
+        result_df['抗拉强度/MPa'] = ''
         
         # 确定输出文件名
         if output_file is None:
@@ -1,7 +1,16 @@
+import codecs
+import io
 import os
 import pandas as pd
 import json
 import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to the standard json module
+    orjson = None
 
 # Configuration
 INPUT_DIR = r'd:\xiangmu\shejixitong\input\各个钻孔-补充'
@@ -15,43 +24,135 @@ STANDARD_COALS = [
     "16-3上煤", "16-3中煤", "16-3煤", "16-4煤"
 ]
 
+# Output bins in stratigraphic order: Overburden, then each coal followed by the
+# rock below it (none after the last coal), then Underburden.
+# Coal i sits at index 1 + 2*i and the interburden below it at 2 + 2*i.
+BIN_NAMES = ["Overburden"]
+BIN_LABELS = ["表土层 (Overburden)"]
+for _i, _coal in enumerate(STANDARD_COALS):
+    BIN_NAMES.append(_coal)
+    BIN_LABELS.append(f"{_coal}")
+    if _i < len(STANDARD_COALS) - 1:
+        BIN_NAMES.append(f"Interburden_{_i}")
+        BIN_LABELS.append(f"岩层 (Rock {_i+1})")
+BIN_NAMES.append("Underburden")
+BIN_LABELS.append("基底 (Underburden)")
+UNDERBURDEN_BIN = len(BIN_NAMES) - 1
+
+def rock_bin_index(active_coal_index):
+    """Bin for a rock layer lying below the given coal (-1: above all coals)."""
+    if active_coal_index == -1:
+        return 0
+    if active_coal_index < len(STANDARD_COALS) - 1:
+        return 2 + 2 * active_coal_index
+    return UNDERBURDEN_BIN
+
+@lru_cache(maxsize=None)
+def match_coal_index(name):
+    """Index of the first STANDARD_COALS entry contained in name, or -1.
+
+    Layer names repeat heavily across boreholes, so results are cached per name.
+    """
+    for idx, coal in enumerate(STANDARD_COALS):
+        if coal in name:
+            return idx
+    return -1
+
+def is_layer_column(col):
+    """Columns read from a borehole CSV: layer name and thickness."""
+    return "名称" in col or "厚度" in col
+
+def read_text(path):
+    """Read a CSV file once and decode it: UTF-8 with BOM, else GBK, else UTF-8."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if raw.startswith(codecs.BOM_UTF8):
+        return raw.decode('utf-8-sig')
+    try:
+        return raw.decode('gbk')
+    except UnicodeDecodeError:
+        return raw.decode('utf-8')
+
 def normalize_name(name):
     if pd.isna(name): return ""
     return str(name).strip()
 
+def process_borehole_file(file_path, bh_name, coords):
+    """Read one borehole CSV and sum its layer thicknesses into the BIN_NAMES bins."""
+    f = os.path.basename(file_path)
+    try:
+        # Only the name/thickness columns are parsed
+        df = pd.read_csv(io.StringIO(read_text(file_path)), usecols=is_layer_column)
+    except Exception as e:
+        print(f"Error reading {f}: {e}")
+        return None
+
+    # Normalize columns
+    name_col = next((c for c in df.columns if "名称" in c), None)
+    thick_col = next((c for c in df.columns if "厚度" in c), None)
+    
+    if not name_col or not thick_col:
+        print(f"Skipping {f}: Columns not found")
+        return None
+
+    # Extract layers as (name, thickness); non-numeric thickness counts as 0
+    layers = list(zip(
+        df[name_col].map(normalize_name),
+        pd.to_numeric(df[thick_col], errors='coerce').fillna(0.0).tolist()
+    ))
+
+    # 3. Align to Standard Sequence (bins indexed as in BIN_NAMES)
+    bins = [0] * len(BIN_NAMES)
+    active_coal_index = -1 
+    
+    # Reverse layers if needed? 
+    # Usually CSVs are top-down (1 is top). 
+    # Let's assume top-down.
+    
+    for name, thickness in layers:
+        # Check if this layer is a standard coal
+        matched_coal_idx = match_coal_index(name)
+
+        if matched_coal_idx != -1 and matched_coal_idx >= active_coal_index:
+            active_coal_index = matched_coal_idx
+            bins[1 + 2 * active_coal_index] += thickness
+        else:
+            # Rock, or a coal that is out of order / duplicate
+            bins[rock_bin_index(active_coal_index)] += thickness
+
+    return {
+        'id': bh_name,
+        'x': coords['x'],
+        'y': coords['y'],
+        'layers': dict(zip(BIN_NAMES, bins))
+    }
+
 def process():
     print("Starting data processing...")
     
     # 1. Load Coordinates
-    try:
-        # Try reading with GBK first (common for Chinese CSVs)
-        coords_df = pd.read_csv(COORD_FILE, encoding='gbk')
-    except:
-        coords_df = pd.read_csv(COORD_FILE, encoding='utf-8')
+    # Decode once (GBK first, common for Chinese CSVs) and parse once
+    coords_df = pd.read_csv(io.StringIO(read_text(COORD_FILE)))
         
-    coords_map = {}
-    for _, row in coords_df.iterrows():
-        # Clean borehole name
-        name = str(row.iloc[0]).strip()
-        try:
-            x = float(row.iloc[1])
-            y = float(row.iloc[2])
-            coords_map[name] = {'x': x, 'y': y}
-        except:
-            continue
+    # Clean borehole names; rows whose coordinates are not numeric are skipped
+    names = coords_df.iloc[:, 0].astype(str).str.strip()
+    xs = pd.to_numeric(coords_df.iloc[:, 1], errors='coerce')
+    ys = pd.to_numeric(coords_df.iloc[:, 2], errors='coerce')
+    coords_map = {
+        name: {'x': float(x), 'y': float(y)}
+        for name, x, y in zip(names, xs, ys)
+        if pd.notna(x) and pd.notna(y)
+    }
             
     print(f"Loaded coordinates for {len(coords_map)} boreholes.")
 
-    # 2. Process Each Borehole
-    boreholes_data = []
-    
+    # 2. Process Each Borehole (files are independent, so they run in worker processes)
     if not os.path.exists(INPUT_DIR):
         print(f"Error: Input directory {INPUT_DIR} does not exist.")
         return
 
-    files = os.listdir(INPUT_DIR)
-    
-    for f in files:
+    tasks = []
+    for f in os.listdir(INPUT_DIR):
         if not f.endswith('.csv'): continue
         bh_name = os.path.splitext(f)[0]
         
@@ -59,120 +160,36 @@ def process():
         if bh_name not in coords_map:
             # print(f"Warning: No coordinates for {bh_name}")
             continue
-            
-        file_path = os.path.join(INPUT_DIR, f)
-        try:
-            # Try different encodings
-            try:
-                df = pd.read_csv(file_path, encoding='gbk')
-            except:
-                df = pd.read_csv(file_path, encoding='utf-8')
-        except Exception as e:
-            print(f"Error reading {f}: {e}")
-            continue
 
-        # Normalize columns
-        name_col = next((c for c in df.columns if "名称" in c), None)
-        thick_col = next((c for c in df.columns if "厚度" in c), None)
-        
-        if not name_col or not thick_col:
-            print(f"Skipping {f}: Columns not found")
-            continue
+        tasks.append((os.path.join(INPUT_DIR, f), bh_name, coords_map[bh_name]))
 
-        # Extract layers
-        layers = []
-        for _, row in df.iterrows():
-            l_name = normalize_name(row[name_col])
-            try:
-                l_thick = float(row[thick_col])
-            except:
-                l_thick = 0
-            layers.append({'name': l_name, 'thickness': l_thick})
-
-        # 3. Align to Standard Sequence
-        bins = {}
-        bins["Overburden"] = 0
-        for i, coal in enumerate(STANDARD_COALS):
-            bins[coal] = 0
-            if i < len(STANDARD_COALS) - 1:
-                bins[f"Interburden_{i}"] = 0 
-        bins["Underburden"] = 0
-        
-        active_coal_index = -1 
-        
-        # Reverse layers if needed? 
-        # Usually CSVs are top-down (1 is top). 
-        # Let's assume top-down.
-        
-        for l in layers:
-            name = l['name']
-            thickness = l['thickness']
-            
-            # Check if this layer is a standard coal
-            matched_coal_idx = -1
-            for idx, coal in enumerate(STANDARD_COALS):
-                if coal in name: 
-                    matched_coal_idx = idx
-                    break
-            
-            if matched_coal_idx != -1:
-                if matched_coal_idx > active_coal_index:
-                    active_coal_index = matched_coal_idx
-                    bins[STANDARD_COALS[active_coal_index]] += thickness
-                elif matched_coal_idx == active_coal_index:
-                     bins[STANDARD_COALS[active_coal_index]] += thickness
-                else:
-                     # Out of order or duplicate
-                     if active_coal_index == -1:
-                         bins["Overburden"] += thickness
-                     elif active_coal_index < len(STANDARD_COALS) - 1:
-                         bins[f"Interburden_{active_coal_index}"] += thickness
-                     else:
-                         bins["Underburden"] += thickness
-            else:
-                # Not a coal seam (Rock)
-                if active_coal_index == -1:
-                    bins["Overburden"] += thickness
-                elif active_coal_index < len(STANDARD_COALS) - 1:
-                    bins[f"Interburden_{active_coal_index}"] += thickness
-                else:
-                    bins["Underburden"] += thickness
-
-        bh_data = {
-            'id': bh_name,
-            'x': coords_map[bh_name]['x'],
-            'y': coords_map[bh_name]['y'],
-            'layers': bins
-        }
-        boreholes_data.append(bh_data)
+    boreholes_data = []
+    if tasks:
+        with ProcessPoolExecutor() as executor:
+            results = executor.map(process_borehole_file, *zip(*tasks), chunksize=4)
+            boreholes_data = [bh_data for bh_data in results if bh_data is not None]
 
     # 4. Output JSON
-    sequence_names = ["Overburden"]
-    sequence_labels = ["表土层 (Overburden)"]
-    
-    for i, coal in enumerate(STANDARD_COALS):
-        sequence_names.append(coal)
-        sequence_labels.append(f"{coal}")
-        
-        if i < len(STANDARD_COALS) - 1:
-            ib_name = f"Interburden_{i}"
-            sequence_names.append(ib_name)
-            sequence_labels.append(f"岩层 (Rock {i+1})")
-            
-    sequence_names.append("Underburden")
-    sequence_labels.append("基底 (Underburden)")
-    
     output = {
-        "standard_sequence": sequence_names,
-        "sequence_labels": sequence_labels,
+        "standard_sequence": BIN_NAMES,
+        "sequence_labels": BIN_LABELS,
         "boreholes": boreholes_data
     }
     
     # Ensure directory exists
     os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
     
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
+    # Write to a temp file next to the target, then atomically swap it in,
+    # so a crash mid-write never leaves the frontend with a truncated file
+    tmp_file = OUTPUT_FILE + '.tmp'
+    if orjson is not None:
+        # orjson writes UTF-8 bytes directly (same layout as json indent=2)
+        with open(tmp_file, 'wb') as f:
+            f.write(orjson.dumps(output, option=orjson.OPT_INDENT_2))
+    else:
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, OUTPUT_FILE)
     
     print(f"Successfully processed {len(boreholes_data)} boreholes.")
     print(f"Data saved to {OUTPUT_FILE}")